@@ -41,16 +41,16 @@ class MySession(Session):
     async def load(self):
         if self.path.exists():
             with self.path.open("rb") as f:
-                self.msgs_from_json(f.read())
+                await self.amsgs_from_json(f.read())
 
     async def save(self):
         with self.path.open("wb") as f:
-            f.write(self.msgs_to_json())
+            f.write(await self.amsgs_to_json())
 
     async def parse_nodes(self):
         if self.path.exists():
             with self.path.open("rb") as f:
-                return self.nodes_from_msgs(json.load(f))
+                return await self.anodes_from_msgs(json.load(f))
 
 
 # Pydantic AI Agent definition
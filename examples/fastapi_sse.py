@@ -12,7 +12,7 @@ from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext
 from redis.asyncio import Redis
 
-from pydantic_ai_stream import Deps, Session, run
+from pydantic_ai_stream import Deps, Runner, Session
 
 
 @dataclass
@@ -58,6 +58,7 @@ async def calculate(ctx: RunContext[AppDeps], expression: str) -> str:
 
 
 redis_client: Redis | None = None
+runner = Runner(max_runs=32, max_runs_per_user=2)
 
 
 @asynccontextmanager
@@ -83,15 +84,7 @@ async def chat(req: PromptRequest, request: Request):
     session_id = req.session_id or str(uuid.uuid4())
     deps = AppDeps(redis=redis_client, user_id=1, session_id=session_id)
 
-    async def run_agent():
-        await run(
-            MemorySession(session_id=session_id),
-            agent,
-            req.prompt,
-            deps=deps,
-        )
-
-    asyncio.create_task(run_agent())
+    await runner.submit(MemorySession(session_id=session_id), agent, req.prompt, deps)
     await asyncio.sleep(0.1)
 
     async def event_stream():
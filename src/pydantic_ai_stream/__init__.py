@@ -1,69 +1,77 @@
-import logging
-from collections.abc import AsyncGenerator
-from typing import Any
-
-from pydantic_ai import Agent
-from redis.asyncio import Redis as AsyncRedis
+from typing import TYPE_CHECKING, Any
 
 from .settings import settings
+from .cache import TailCache
+from .transport import MemoryTransport, RedisTransport, Transport
+from .live import LiveCache
+from .listen import listen_many, q
 from .deps import Deps
-from .session import Session
+from .bridge import SyncDeps, get_bridge
 
+if TYPE_CHECKING:
+    from .batching import SessionLockLostError, SessionQueue
+    from .checkpoint import Checkpoints
+    from .engine import AgxCanceledError, resume, run
+    from .response_cache import ResponseCache
+    from .runner import Runner
+    from .session import Session
+    from .worker import Job, Worker, enqueue
 
-__all__ = ["settings", "Deps", "Session", "AgxCanceledError", "run", "q"]
 
-logger = logging.getLogger(__name__)
+__all__ = [
+    "settings",
+    "Deps",
+    "SyncDeps",
+    "Session",
+    "Runner",
+    "SessionQueue",
+    "SessionLockLostError",
+    "TailCache",
+    "ResponseCache",
+    "Checkpoints",
+    "Transport",
+    "RedisTransport",
+    "MemoryTransport",
+    "LiveCache",
+    "Job",
+    "Worker",
+    "AgxCanceledError",
+    "enqueue",
+    "run",
+    "resume",
+    "q",
+    "listen_many",
+    "get_bridge",
+]
 
+# Producer-side names pull in pydantic-ai, they are only imported on first use
+# so listener processes stay light
+_LAZY = {
+    "Session": "session",
+    "Runner": "runner",
+    "SessionQueue": "batching",
+    "SessionLockLostError": "batching",
+    "ResponseCache": "response_cache",
+    "Checkpoints": "checkpoint",
+    "Job": "worker",
+    "Worker": "worker",
+    "enqueue": "worker",
+    "AgxCanceledError": "engine",
+    "run": "engine",
+    "resume": "engine",
+}
 
-class AgxCanceledError(Exception):
-    pass
 
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
 
-async def run(
-    session: Session,
-    agent: Any,
-    user_prompt: str,
-    deps: Deps,
-    **kwargs: Any,
-) -> None:
-    await session.load()
-    await deps.start()
-    try:
-        async with agent.iter(
-            user_prompt, deps=deps, message_history=session.msgs, **kwargs
-        ) as agent_run:  # type: ignore[arg-type]
-            async for node in agent_run:
-                if not await deps.is_live():
-                    raise AgxCanceledError()
-                if Agent.is_model_request_node(node):
-                    await deps.add_node_begin(node)
-                    async with node.stream(agent_run.ctx) as node_stream:
-                        async for event in node_stream:
-                            await agent_run.ctx.deps.user_deps.add_node_event(event)
-                    await deps.add_node_end()
-            if agent_run.result is not None:
-                session.add_msgs(agent_run.result.new_messages())
-            await session.save()
-    except AgxCanceledError:
-        await deps.add_error({"msg": "canceled"})
-        raise
-    except Exception as e:
-        await deps.add_error({"msg": f"crashed - {e}"})
-        raise
-    finally:
-        await deps.stop()
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
 
 
-async def q(
-    redis: AsyncRedis,
-    scope_id: int,
-    user_id: int,
-) -> AsyncGenerator[tuple[int, int, str], None]:
-    async for k in redis.scan_iter(
-        f"{settings.redis_prefix}:{scope_id}:{user_id}:*:live"
-    ):
-        key_str = k if isinstance(k, str) else k.decode()
-        parts = key_str.rsplit(":", 4)
-        if len(parts) >= 4:
-            _, s_id, u_id, sess_id = parts[0], parts[-4], parts[-3], parts[-2]
-            yield int(s_id), int(u_id), sess_id
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_LAZY])
@@ -0,0 +1,108 @@
+import json
+from collections.abc import Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any
+
+from .offload import mp_context
+from .session import Session
+
+TYPES = {
+    "session": "int64",
+    "node": "int32",
+    "part_kind": "string",
+    "tool_name": "string",
+    "input_tokens": "int64",
+    "output_tokens": "int64",
+}
+COLUMNS = tuple(TYPES)
+
+
+@dataclass(kw_only=True)
+class Records:
+    columns: dict[str, list[Any]] = field(
+        default_factory=lambda: {c: [] for c in COLUMNS}
+    )
+
+    def __len__(self) -> int:
+        return len(self.columns["session"])
+
+    def extend(self, other: "Records") -> None:
+        for c in COLUMNS:
+            self.columns[c].extend(other.columns[c])
+
+    def to_numpy(self) -> dict[str, Any]:
+        import numpy as np
+
+        return {
+            c: np.asarray(v, dtype=object if TYPES[c] == "string" else TYPES[c])
+            for c, v in self.columns.items()
+        }
+
+    def to_arrow(self) -> Any:
+        import pyarrow as pa
+
+        return pa.table(
+            {
+                c: pa.array(v, type=pa.type_for_alias(TYPES[c]))
+                for c, v in self.columns.items()
+            }
+        )
+
+
+def records_from_json(session: int, data: bytes | str) -> Records:
+    records = Records()
+    cols = records.columns
+    for n, node in enumerate(Session.nodes_from_msgs(json.loads(data))):
+        usage = node.get("usage") or {}
+        # Node usage lands on its first row only, so column sums give totals
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        for part in node["parts"]:
+            cols["session"].append(session)
+            cols["node"].append(n)
+            cols["part_kind"].append(part.get("part_kind"))
+            cols["tool_name"].append(part.get("tool_name"))
+            cols["input_tokens"].append(input_tokens)
+            cols["output_tokens"].append(output_tokens)
+            input_tokens = output_tokens = 0
+    return records
+
+
+def _records_batch(batch: list[tuple[int, bytes | str]]) -> Records:
+    records = Records()
+    for session, data in batch:
+        records.extend(records_from_json(session, data))
+    return records
+
+
+def _batches(
+    histories: Iterable[bytes | str], size: int
+) -> Iterable[list[tuple[int, bytes | str]]]:
+    it = enumerate(histories)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def extract_records(
+    histories: Iterable[bytes | str],
+    *,
+    max_workers: int | None = None,
+    batch_size: int = 64,
+    executor: Executor | None = None,
+) -> Records:
+    records = Records()
+    batches = _batches(histories, batch_size)
+    if max_workers == 0:
+        for batch in batches:
+            records.extend(_records_batch(batch))
+        return records
+    if executor is not None:
+        for part in executor.map(_records_batch, batches):
+            records.extend(part)
+        return records
+    with ProcessPoolExecutor(max_workers, mp_context=mp_context()) as pool:
+        for part in pool.map(_records_batch, batches):
+            records.extend(part)
+    return records
@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Coroutine
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Literal
+
+from .cache import Entry
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+_background: set[asyncio.Task[None]] = set()
+
+
+class ArchiveSink(ABC):
+    @abstractmethod
+    async def write(self, key: str, entries: list[Entry]) -> None:
+        raise NotImplementedError()
+
+
+@dataclass(kw_only=True)
+class FileSink(ArchiveSink):
+    directory: Path
+    compression: Literal["gzip", "zstd"] = "gzip"
+
+    def path(self, key: str, entries: list[Entry]) -> Path:
+        suffix = "gz" if self.compression == "gzip" else "zst"
+        first_id = entries[0][0] if entries else "0-0"
+        return self.directory.joinpath(*key.split(":")) / f"{first_id}.jsonl.{suffix}"
+
+    async def write(self, key: str, entries: list[Entry]) -> None:
+        await asyncio.to_thread(self._write, self.path(key, entries), entries)
+
+    def _write(self, path: Path, entries: list[Entry]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _open(path, "wt") as f:
+            for entry_id, event in entries:
+                f.write(json.dumps({"id": entry_id} | event) + "\n")
+
+
+def _open(path: Path, mode: Literal["rt", "wt"]) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode, encoding="utf-8")
+    try:
+        from compression import zstd  # type: ignore[import-not-found]
+    except ImportError:
+        try:
+            import zstandard as zstd  # type: ignore[import-not-found]
+        except ImportError as e:
+            raise ImportError(
+                "zstd archives require Python 3.14+ or the zstandard package"
+            ) from e
+    return zstd.open(path, mode, encoding="utf-8")
+
+
+def read_archive(path: Path) -> list[Entry]:
+    entries: list[Entry] = []
+    with _open(path, "rt") as f:
+        for line in f:
+            event = json.loads(line)
+            entries.append((event.pop("id"), event))
+    return entries
+
+
+async def drain(
+    transport: Transport, key: str, *, end: str = "+", page: int = 1000
+) -> list[Entry]:
+    entries: list[Entry] = []
+    start = "-"
+    while batch := await transport.range(key, start, end, count=page):
+        entries.extend(batch)
+        if len(batch) < page:
+            break
+        start = f"({batch[-1][0]}"
+    return entries
+
+
+async def archive_stream(
+    transport: Transport,
+    key: str,
+    sink: ArchiveSink,
+    *,
+    end: str = "+",
+    page: int = 1000,
+) -> None:
+    await sink.write(key, await drain(transport, key, end=end, page=page))
+
+
+def spawn(coro: Coroutine[Any, Any, None]) -> None:
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def wait_archived() -> None:
+    while _background:
+        await asyncio.gather(*_background, return_exceptions=True)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+from uuid import uuid4
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import WatchError
+
+from .deps import Deps
+from .engine import _run_turns
+from .session import Session
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLockLostError(Exception):
+    pass
+
+
+@dataclass(kw_only=True)
+class SessionQueue:
+    redis: AsyncRedis
+    merge: bool = False
+    separator: str = "\n\n"
+    lock_ttl: int = 30
+
+    def key_prompts(self, deps: Deps) -> str:
+        return f"{deps.key()}:prompts"
+
+    def key_lock(self, deps: Deps) -> str:
+        return f"{deps.key()}:lock"
+
+    async def run(
+        self,
+        session: Session,
+        agent: Any,
+        user_prompt: str,
+        deps: Deps,
+        **kwargs: Any,
+    ) -> bool:
+        await self.redis.rpush(self.key_prompts(deps), user_prompt)  # type: ignore[misc]
+        ran = False
+        while True:
+            token = uuid4().hex
+            if not await self.redis.set(
+                self.key_lock(deps), token, nx=True, ex=self.lock_ttl
+            ):
+                # The holder picks our prompt up before it lets go of the lock
+                return ran
+            try:
+                # An earlier holder may have run our prompt before letting go
+                if not await self.redis.llen(self.key_prompts(deps)):  # type: ignore[misc]
+                    return ran
+                await self._drain(session, agent, deps, token, **kwargs)
+                ran = True
+            finally:
+                await self._if_owner(self.key_lock(deps), token, "delete")
+            # Prompts pushed after the last pop found the lock still taken
+            if not await self.redis.llen(self.key_prompts(deps)):  # type: ignore[misc]
+                return ran
+
+    async def _drain(
+        self, session: Session, agent: Any, deps: Deps, token: str, **kwargs: Any
+    ) -> None:
+        turns = asyncio.create_task(
+            _run_turns(session, agent, self._prompts(deps), deps, **kwargs)
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(self.key_lock(deps), token))
+        try:
+            await asyncio.wait({turns, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if turns.done():
+                return turns.result()
+        except BaseException:
+            # Nobody else picks the waiting prompts up after a failed drain
+            await self.redis.delete(self.key_prompts(deps))
+            raise
+        finally:
+            for pending in (turns, heartbeat):
+                pending.cancel()
+            await asyncio.gather(turns, heartbeat, return_exceptions=True)
+        # The new holder runs the waiting prompts, saving now would overwrite it
+        raise SessionLockLostError(self.key_lock(deps))
+
+    async def _prompts(self, deps: Deps) -> AsyncIterator[str]:
+        key = self.key_prompts(deps)
+        while True:
+            if self.merge:
+                batch = await self.redis.lpop(key, 1024)  # type: ignore[misc]
+            else:
+                batch = await self.redis.lpop(key, 1)  # type: ignore[misc]
+            if not batch:
+                return
+            yield self.separator.join(prompt.decode() for prompt in batch)
+
+    async def _heartbeat(self, key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            if not await self._if_owner(key, token, "expire"):
+                logger.warning(f"Lost session lock {key}, stopping the batch")
+                return
+
+    async def _if_owner(self, key: str, token: str, op: str) -> bool:
+        async with self.redis.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != token.encode():
+                    return False
+                pipe.multi()
+                if op == "delete":
+                    pipe.delete(key)
+                else:
+                    pipe.expire(key, self.lock_ttl)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
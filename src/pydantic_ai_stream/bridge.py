@@ -0,0 +1,103 @@
+import asyncio
+import atexit
+import threading
+from collections.abc import AsyncGenerator, Awaitable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from .deps import Deps
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_bridge: "Bridge | None" = None
+
+
+# One event loop in a daemon thread serves every sync caller of the process
+class Bridge:
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="pydantic-ai-stream-bridge", daemon=True
+        )
+        self.thread.start()
+
+    def call(self, aw: Awaitable[T], timeout: float | None = None) -> T:
+        if self.thread is threading.current_thread():
+            raise RuntimeError("Bridge.call() would block its own event loop")
+        future = asyncio.run_coroutine_threadsafe(_await(aw), self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncGenerator[T, None]) -> Iterator[T]:
+        try:
+            while True:
+                try:
+                    yield self.call(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Also runs when the caller stops iterating early
+            self.call(agen.aclose())
+
+    def close(self) -> None:
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+async def _await(aw: Awaitable[T]) -> T:
+    return await aw
+
+
+def get_bridge() -> Bridge:
+    global _bridge
+    with _lock:
+        if _bridge is None or _bridge.loop.is_closed():
+            _bridge = Bridge()
+            atexit.register(_bridge.close)
+        return _bridge
+
+
+@dataclass(kw_only=True)
+class SyncDeps:
+    # The wrapped Deps' redis client belongs to the bridge loop, share one
+    # client (and its connection pool) across SyncDeps instead of one per call
+    deps: Deps
+    bridge: Bridge = field(default_factory=get_bridge)
+
+    def listen(self, **kwargs: Any) -> Iterator[dict[str, Any] | str | Any]:
+        return self.bridge.iterate(self.deps.listen(**kwargs))
+
+    def add(
+        self, *, type: str, origin: str, body: dict[str, Any] | None = None
+    ) -> None:
+        self.bridge.call(self.deps.add(type=type, origin=origin, body=body))
+
+    def add_error(self, body: dict[str, Any], origin: str = "developer") -> None:
+        self.bridge.call(self.deps.add_error(body, origin))
+
+    def add_info(self, body: dict[str, Any], origin: str = "developer") -> None:
+        self.bridge.call(self.deps.add_info(body, origin))
+
+    def add_tool_progress(
+        self, tool_call_id: str, body: dict[str, Any] | None = None
+    ) -> None:
+        self.bridge.call(self.deps.add_tool_progress(tool_call_id, body))
+
+    def start(self) -> None:
+        self.bridge.call(self.deps.start())
+
+    def stop(self, grace_period: int = 5) -> None:
+        self.bridge.call(self.deps.stop(grace_period))
+
+    def is_live(self) -> bool:
+        return self.bridge.call(self.deps.is_live())
+
+    def cancel(self) -> bool:
+        return self.bridge.call(self.deps.cancel())
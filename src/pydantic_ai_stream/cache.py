@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any
+
+Entry = tuple[str, dict[str, Any]]
+
+
+def stream_id(entry_id: str) -> tuple[int, int]:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+@dataclass(kw_only=True)
+class Tail:
+    base: str
+    entries: deque[Entry]
+    touched: float = field(default_factory=time.monotonic)
+
+    def last_id(self) -> str:
+        return self.entries[-1][0] if self.entries else self.base
+
+
+@dataclass(kw_only=True)
+class TailCache:
+    max_keys: int = 1024
+    max_entries: int = 4096
+    ttl: float = 60
+    tails: OrderedDict[str, Tail] = field(default_factory=OrderedDict)
+
+    def get(self, key: str) -> Tail | None:
+        tail = self.tails.get(key)
+        if tail is None:
+            return None
+        now = time.monotonic()
+        if now - tail.touched > self.ttl:
+            del self.tails[key]
+            return None
+        tail.touched = now
+        self.tails.move_to_end(key)
+        return tail
+
+    def snapshot(self, key: str) -> tuple[str, list[Entry]]:
+        tail = self.get(key)
+        if tail is None:
+            return "0", []
+        return tail.base, list(tail.entries)
+
+    def extend(self, key: str, after: str, batch: list[Entry]) -> None:
+        # `batch` holds every entry following `after`, so it extends the tail
+        # only when `after` does not lie beyond what is already cached
+        tail = self.get(key)
+        if tail is None or stream_id(after) > stream_id(tail.last_id()):
+            tail = Tail(base=after, entries=deque(maxlen=self.max_entries))
+            self.tails[key] = tail
+            while len(self.tails) > self.max_keys:
+                self.tails.popitem(last=False)
+        last = stream_id(tail.last_id())
+        for entry_id, event in batch:
+            if stream_id(entry_id) <= last:
+                continue
+            if len(tail.entries) == self.max_entries:
+                tail.base = tail.entries[0][0]
+            tail.entries.append((entry_id, event))
+
+    def drop(self, key: str) -> None:
+        self.tails.pop(key, None)
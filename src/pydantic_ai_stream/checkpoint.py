@@ -0,0 +1,59 @@
+import json
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+from redis.asyncio import Redis as AsyncRedis
+
+from .deps import Deps, Node, Runtime, ToolStats
+
+
+@dataclass(kw_only=True)
+class Checkpoint:
+    msgs: list[ModelMessage]
+    runtime: Runtime
+
+
+def _dump_runtime(runtime: Runtime) -> dict[str, Any]:
+    # Only finished nodes are checkpointed, their streaming state is not needed
+    return {
+        "nodes": len(runtime.nodes),
+        "tool_stats": {name: asdict(s) for name, s in runtime.tool_stats.items()},
+    }
+
+
+def _load_runtime(data: dict[str, Any]) -> Runtime:
+    return Runtime(
+        nodes=[Node(idx=idx, stopped=True) for idx in range(data["nodes"])],
+        tool_stats={name: ToolStats(**s) for name, s in data["tool_stats"].items()},
+    )
+
+
+@dataclass(kw_only=True)
+class Checkpoints:
+    redis: AsyncRedis
+    ttl: int = 24 * 3600
+    every: int = 1
+
+    def key(self, deps: Deps) -> str:
+        return f"{deps.key()}:checkpoint"
+
+    async def save(self, deps: Deps, msgs: list[ModelMessage]) -> None:
+        data = {
+            "msgs": ModelMessagesTypeAdapter.dump_python(msgs, mode="json"),
+            "runtime": _dump_runtime(deps.runtime),
+        }
+        await self.redis.set(self.key(deps), json.dumps(data), ex=self.ttl)
+
+    async def load(self, deps: Deps) -> Checkpoint | None:
+        raw = await self.redis.get(self.key(deps))
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return Checkpoint(
+            msgs=ModelMessagesTypeAdapter.validate_python(data["msgs"]),
+            runtime=_load_runtime(data["runtime"]),
+        )
+
+    async def clear(self, deps: Deps) -> None:
+        await self.redis.delete(self.key(deps))
@@ -0,0 +1,140 @@
+import json
+from typing import Any
+
+# Wire format versions, stored in the `v` field of compact entries. JSON entries
+# carry no marker, so streams written before compact encoding stay readable.
+VERSION = 1
+
+# Code tables are append-only: codes are positions, reordering breaks old streams
+TYPES = ("begin", "event", "error", "info", "end")
+ORIGINS = ("pydantic-ai", "pydantic-ai-stream", "developer")
+KEYS = (
+    "idx",
+    "event",
+    "event_idx",
+    "part_kind",
+    "part_delta_kind",
+    "content",
+    "content_delta",
+    "tool_name",
+    "tool_call_id",
+    "args",
+    "session_id",
+    "msg",
+    "duration_ms",
+    "chunks",
+    "chunk_idx",
+    "content_encoding",
+)
+ENUMS = {
+    "event": (
+        "llm-begin",
+        "llm-end",
+        "part_start",
+        "part_delta",
+        "answer",
+        "tool-start",
+        "tool-progress",
+        "tool-end",
+        "part_chunk",
+        "canceled",
+    ),
+    "part_kind": ("text", "thinking", "tool-call", "tool-return", "retry-prompt"),
+    "part_delta_kind": ("text", "thinking", "tool_call"),
+}
+
+_TYPE_CODES = {v: i for i, v in enumerate(TYPES)}
+_ORIGIN_CODES = {v: i for i, v in enumerate(ORIGINS)}
+_KEY_CODES = {v: i for i, v in enumerate(KEYS)}
+_ENUM_CODES = {k: {v: i for i, v in enumerate(vs)} for k, vs in ENUMS.items()}
+
+
+class RawJSON(str):
+    # A body value the producer already encoded as JSON, spliced in as is
+    __slots__ = ()
+
+
+def materialize(body: dict[str, Any]) -> dict[str, Any]:
+    # Only `content` may be pre-encoded, which keeps the check O(1) per entry
+    content = body.get("content")
+    if type(content) is RawJSON:
+        return body | {"content": json.loads(content)}
+    return body
+
+
+def _dumps(body: dict[str, Any]) -> str:
+    content = body.get("content")
+    if type(content) is not RawJSON:
+        return json.dumps(body)
+    rest = json.dumps({k: v for k, v in body.items() if k != "content"})
+    if rest == "{}":
+        return f'{{"content": {content}}}'
+    return f'{rest[:-1]}, "content": {content}}}'
+
+
+def _msgpack() -> Any:
+    try:
+        import msgpack
+    except ImportError as e:
+        raise ImportError(
+            "msgpack stream encoding requires the msgpack extra: "
+            "pip install 'pydantic-ai-stream[msgpack]'"
+        ) from e
+    return msgpack
+
+
+def _pack(table: dict[str, int], value: str) -> int | str:
+    return table.get(value, value)
+
+
+def _unpack(table: tuple[str, ...], value: int | str) -> str:
+    return table[value] if isinstance(value, int) else value
+
+
+def encode(
+    type: str, origin: str, body: dict[str, Any] | None, codec: str = "json"
+) -> dict[str, Any]:
+    if codec == "json":
+        fields: dict[str, Any] = {"type": type, "origin": origin}
+        if body is not None:
+            fields["body"] = _dumps(body)
+        return fields
+    if codec != "msgpack":
+        raise ValueError(f"Unknown stream codec - {codec}")
+    compact: dict[int | str, Any] | None = None
+    if body is not None:
+        compact = {}
+        for k, v in materialize(body).items():
+            if k in _ENUM_CODES and isinstance(v, str):
+                v = _pack(_ENUM_CODES[k], v)
+            compact[_pack(_KEY_CODES, k)] = v
+    payload = [_pack(_TYPE_CODES, type), _pack(_ORIGIN_CODES, origin), compact]
+    return {"v": VERSION, "m": _msgpack().packb(payload)}
+
+
+def decode(entry: dict[bytes, bytes]) -> dict[str, Any]:
+    version = entry.get(b"v")
+    if version is None:
+        return {
+            "type": entry[b"type"].decode(),
+            "origin": entry[b"origin"].decode(),
+            "body": json.loads(entry.get(b"body", "{}")),
+        }
+    if int(version) != VERSION:
+        raise ValueError(f"Unsupported stream entry version - {version!r}")
+    type, origin, compact = _msgpack().unpackb(entry[b"m"], strict_map_key=False)
+    return {
+        "type": _unpack(TYPES, type),
+        "origin": _unpack(ORIGINS, origin),
+        "body": _unpack_body(compact or {}),
+    }
+
+
+def _unpack_body(compact: dict[int | str, Any]) -> dict[str, Any]:
+    body: dict[str, Any] = {}
+    for k, v in compact.items():
+        key = _unpack(KEYS, k)
+        if key in ENUMS and isinstance(v, int):
+            v = ENUMS[key][v]
+        body[key] = v
+    return body
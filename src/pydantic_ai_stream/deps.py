@@ -1,31 +1,44 @@
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from collections.abc import AsyncGenerator
 import json
+import time
 
-from pydantic_ai.messages import (
-    FinalResultEvent,
-    PartDeltaEvent,
-    PartStartEvent,
-    PartEndEvent,
-    TextPart,
-    TextPartDelta,
-    ThinkingPart,
-    ThinkingPartDelta,
-    ToolCallPart,
-    ToolCallPartDelta,
-    ToolReturnPart,
-)
 from redis.asyncio import Redis as AsyncRedis
-from pydantic_ai._agent_graph import ModelRequestNode
 
+from . import codec
+from .archive import ArchiveSink, archive_stream, spawn
+from .cache import Entry, TailCache
+from .events import StreamEvent, from_event
+from .pacing import pace
 from .settings import settings
+from .transport import RedisTransport, Transport
 
+# pydantic-ai is only imported by the methods producing events, so listener
+# processes never load it
+if TYPE_CHECKING:
+    from pydantic_ai._agent_graph import ModelRequestNode
+    from pydantic_ai.messages import (
+        FinalResultEvent,
+        FunctionToolCallEvent,
+        FunctionToolResultEvent,
+        PartDeltaEvent,
+        PartStartEvent,
+        ToolReturnPart,
+    )
 
 logger = logging.getLogger(__name__)
 
+# Event types mirrored onto the control lane
+CONTROL_TYPES = ("error", "info")
+# Page size for reads of the main stream when a control lane is merged in
+CONTROL_PAGE = 256
+# Seconds an archived stream may outlive its grace period while it is copied
+ARCHIVE_BUDGET = 600
+
 
 @dataclass(kw_only=True)
 class Node:
@@ -35,17 +48,55 @@ class Node:
     stopped: bool = False
 
 
+@dataclass(kw_only=True)
+class ToolCall:
+    tool_name: str
+    started: float = field(default_factory=time.perf_counter)
+
+
+@dataclass(kw_only=True)
+class ToolStats:
+    calls: int = 0
+    total_ms: float = 0
+    max_ms: float = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0
+
+    def record(self, duration_ms: float) -> None:
+        self.calls += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+
 @dataclass(kw_only=True)
 class Runtime:
     nodes: list[Node] = field(default_factory=list)
+    tool_calls: dict[str, ToolCall] = field(default_factory=dict)
+    tool_stats: dict[str, ToolStats] = field(default_factory=dict)
 
 
 @dataclass(kw_only=True)
 class Deps(ABC):
-    redis: AsyncRedis
+    redis: AsyncRedis | None = None
+    transport: Transport | None = None
     user_id: int
     session_id: str
     runtime: Runtime = field(default_factory=Runtime)
+    archive: ArchiveSink | None = None
+    control_lane: bool = False
+    # Turn events are collected here while a response cache records a turn
+    recorded: list[dict[str, Any]] | None = field(default=None, init=False, repr=False)
+    # The transport in use, never None once initialized
+    _transport: Transport = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.transport is None:
+            if self.redis is None:
+                raise ValueError("Deps needs either a redis client or a transport")
+            self.transport = RedisTransport(redis=self.redis)
+        self._transport = self.transport
 
     @abstractmethod
     def get_scope_id(self) -> int:
@@ -57,15 +108,31 @@ class Deps(ABC):
     def key_live(self) -> str:
         return f"{settings.redis_prefix}:{self.get_scope_id()}:{self.user_id}:{self.session_id}:live"
 
+    def key_control(self) -> str:
+        return f"{self.key()}:ctl"
+
     async def add(
         self, *, type: str, origin: str, body: dict[str, Any] | None = None
     ) -> None:
-        fields: dict[str, Any] = {"type": type, "origin": origin}
-        if body is not None:
-            fields["body"] = json.dumps(body)
-        await self.redis.xadd(self.key(), fields)  # type: ignore[arg-type]
+        if self.recorded is not None and type == "event" and body is not None:
+            body = codec.materialize(body)
+            self.recorded.append({"type": type, "origin": origin, "body": body})
+        await self._transport.add(self.key(), type=type, origin=origin, body=body)
+
+    async def add_recorded(self, events: list[dict[str, Any]]) -> None:
+        # Replays a recorded turn after the nodes this run already streamed
+        base = len(self.runtime.nodes)
+        for event in events:
+            body = event["body"]
+            if "idx" in body:
+                body = body | {"idx": body["idx"] + base}
+                if body.get("event") == "llm-begin":
+                    self.runtime.nodes.append(Node(idx=body["idx"], stopped=True))
+            await self.add(type=event["type"], origin=event["origin"], body=body)
+
+    async def add_node_begin(self, node: "ModelRequestNode[Any, Any]") -> None:
+        from pydantic_ai.messages import ToolReturnPart
 
-    async def add_node_begin(self, node: ModelRequestNode[Any, Any]) -> None:
         new = Node(idx=len(self.runtime.nodes))
         self.runtime.nodes.append(new)
         await self.add(
@@ -75,18 +142,56 @@ class Deps(ABC):
         )
         for part in node.request.parts:
             if isinstance(part, ToolReturnPart):
-                await self.add(
-                    type="event",
-                    origin="pydantic-ai",
-                    body={
-                        "idx": new.idx,
-                        "event": "part_start",
-                        "part_kind": part.part_kind,
-                        "tool_name": part.tool_name,
-                        "tool_call_id": part.tool_call_id,
-                        "content": part.content,
-                    },
-                )
+                await self.add_tool_return(new.idx, part)
+
+    async def add_tool_return(self, idx: int, part: "ToolReturnPart") -> None:
+        body: dict[str, Any] = {
+            "idx": idx,
+            "event": "part_start",
+            "part_kind": part.part_kind,
+            "tool_name": part.tool_name,
+            "tool_call_id": part.tool_call_id,
+        }
+        content = part.content
+        size = settings.tool_return_chunk_size
+        if not size:
+            await self.add(
+                type="event", origin="pydantic-ai", body=body | {"content": content}
+            )
+            return
+        # The budget is in bytes, what the stream entry actually carries
+        text = content if isinstance(content, str) else json.dumps(content)
+        data = text.encode()
+        if len(data) <= size:
+            if not isinstance(content, str) and self._transport.raw_json:
+                content = codec.RawJSON(text)
+            await self.add(
+                type="event", origin="pydantic-ai", body=body | {"content": content}
+            )
+            return
+        chunks = _split_utf8(data, size)
+        await self.add(
+            type="event",
+            origin="pydantic-ai",
+            body=body
+            | {
+                "content": "",
+                "content_encoding": "text" if isinstance(content, str) else "json",
+                "chunks": len(chunks),
+            },
+        )
+        for chunk_idx, chunk in enumerate(chunks):
+            await self.add(
+                type="event",
+                origin="pydantic-ai",
+                body={
+                    "idx": idx,
+                    "event": "part_chunk",
+                    "tool_call_id": part.tool_call_id,
+                    "chunk_idx": chunk_idx,
+                    "content_delta": chunk,
+                },
+            )
 
     async def add_node_end(self) -> None:
         current = self.runtime.nodes[-1]
@@ -98,9 +203,34 @@ class Deps(ABC):
         )
         current.stopped = True
 
+    async def add_node_canceled(self) -> None:
+        self.runtime.tool_calls.clear()
+        if not self.runtime.nodes or self.runtime.nodes[-1].stopped:
+            return
+        current = self.runtime.nodes[-1]
+        await self.add(
+            type="event",
+            origin="pydantic-ai",
+            body={"idx": current.idx, "event": "canceled"},
+        )
+        current.stopped = True
+
     async def add_node_event(
-        self, event: PartStartEvent | PartDeltaEvent | FinalResultEvent | Any
+        self, event: "PartStartEvent | PartDeltaEvent | FinalResultEvent | Any"
     ) -> None:
+        from pydantic_ai.messages import (
+            FinalResultEvent,
+            PartDeltaEvent,
+            PartEndEvent,
+            PartStartEvent,
+            TextPart,
+            TextPartDelta,
+            ThinkingPart,
+            ThinkingPartDelta,
+            ToolCallPart,
+            ToolCallPartDelta,
+        )
+
         current = self.runtime.nodes[-1]
         body: dict[str, Any] = {"idx": current.idx}
         if isinstance(event, PartStartEvent):
@@ -170,42 +300,189 @@ class Deps(ABC):
         else:
             logger.error(f"Unknown event type - {type(event).__name__}")
 
-    async def add_error(self, body: dict[str, Any], origin: str = "developer") -> None:
+    async def add_tool_event(
+        self, event: "FunctionToolCallEvent | FunctionToolResultEvent | Any"
+    ) -> None:
+        from pydantic_ai.messages import FunctionToolCallEvent, FunctionToolResultEvent
+
+        body: dict[str, Any] = {"idx": len(self.runtime.nodes) - 1}
+        if isinstance(event, FunctionToolCallEvent):
+            part = event.part
+            self.runtime.tool_calls[part.tool_call_id] = ToolCall(
+                tool_name=part.tool_name
+            )
+            await self.add(
+                type="event",
+                origin="pydantic-ai",
+                body=body
+                | {
+                    "event": "tool-start",
+                    "tool_name": part.tool_name,
+                    "tool_call_id": part.tool_call_id,
+                },
+            )
+        elif isinstance(event, FunctionToolResultEvent):
+            part = event.part
+            call = self.runtime.tool_calls.pop(part.tool_call_id, None)
+            if call is None:
+                duration_ms = 0.0
+            else:
+                duration_ms = (time.perf_counter() - call.started) * 1000
+                self.runtime.tool_stats.setdefault(call.tool_name, ToolStats()).record(
+                    duration_ms
+                )
+            await self.add(
+                type="event",
+                origin="pydantic-ai",
+                body=body
+                | {
+                    "event": "tool-end",
+                    "part_kind": part.part_kind,
+                    "tool_name": part.tool_name,
+                    "tool_call_id": part.tool_call_id,
+                    "duration_ms": round(duration_ms, 3),
+                },
+            )
+        else:
+            logger.debug(f"Ignoring tool event - {type(event).__name__}")
+
+    async def add_tool_progress(
+        self, tool_call_id: str, body: dict[str, Any] | None = None
+    ) -> None:
+        call = self.runtime.tool_calls.get(tool_call_id)
         await self.add(
+            type="event",
+            origin="pydantic-ai",
+            body={
+                "idx": len(self.runtime.nodes) - 1,
+                "event": "tool-progress",
+                "tool_name": call.tool_name if call is not None else None,
+                "tool_call_id": tool_call_id,
+            }
+            | (body or {}),
+        )
+
+    async def add_error(self, body: dict[str, Any], origin: str = "developer") -> None:
+        await self.add_control(
             type="error",
             origin=origin,
             body=body,
         )
 
     async def add_info(self, body: dict[str, Any], origin: str = "developer") -> None:
-        await self.add(
+        await self.add_control(
             type="info",
             origin=origin,
             body=body,
         )
 
+    async def add_control(
+        self, *, type: str, origin: str, body: dict[str, Any] | None = None
+    ) -> None:
+        # The lane copy goes first, the main stream keeps the complete record
+        if self.control_lane:
+            await self._transport.add(
+                self.key_control(), type=type, origin=origin, body=body
+            )
+        await self.add(type=type, origin=origin, body=body)
+
     async def start(self) -> None:
-        await self.redis.set(self.key_live(), 1)
-        await self.add(
-            type="begin",
-            origin="pydantic-ai-stream",
-            body={"session_id": self.session_id},
+        await asyncio.gather(
+            self._transport.set_flag(self.key_live()),
+            self.add(
+                type="begin",
+                origin="pydantic-ai-stream",
+                body={"session_id": self.session_id},
+            ),
         )
 
     async def stop(self, grace_period: int = 5) -> None:
-        await self.add(type="end", origin="pydantic-ai-stream")
-        await self.redis.delete(self.key_live())
-        await self.redis.expire(self.key(), grace_period)
+        end_id = await self._transport.add(
+            self.key(), type="end", origin="pydantic-ai-stream", body=None
+        )
+        await self._transport.delete(self.key_live())
+        if self.control_lane:
+            await self._transport.expire(self.key_control(), grace_period)
+        if self.archive is None:
+            await self._transport.expire(self.key(), grace_period)
+        else:
+            # Bounds the stream's lifetime even if the process dies mid-archival
+            await self._transport.expire(self.key(), grace_period + ARCHIVE_BUDGET)
+            spawn(self._archive(self.archive, end_id, grace_period))
+
+    async def _archive(self, sink: ArchiveSink, end_id: str, grace_period: int) -> None:
+        # The stream outlives the archival so it is drained before it expires
+        try:
+            await archive_stream(self._transport, self.key(), sink, end=end_id)
+        # Sinks are user code and nothing awaits this task, failures are logged
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Archival failed for {self.key()} - {e!r}")
+        finally:
+            await self._transport.expire(self.key(), grace_period)
+
+    async def expire_live(self, seconds: int) -> None:
+        await self._transport.expire_flag(self.key_live(), seconds)
 
     async def is_live(self) -> bool:
-        return await self.redis.get(self.key_live()) is not None
+        return await self._transport.has_flag(self.key_live())
 
     async def listen(
-        self, *, wait: int = 3, timeout: int = 60, serialize: bool = True
-    ) -> AsyncGenerator[dict[str, Any] | str, None]:
-        counter, last_id = 0, "0"
+        self,
+        *,
+        wait: int = 3,
+        timeout: int = 60,
+        serialize: bool = True,
+        cache: TailCache | None = None,
+        reassemble: bool = False,
+        frame_rate: float | None = None,
+        typed: bool = False,
+    ) -> AsyncGenerator[dict[str, Any] | str | StreamEvent, None]:
+        events = self._events(wait=wait, timeout=timeout, cache=cache)
+        if reassemble:
+            events = reassemble_chunks(events)
+        if frame_rate:
+            events = pace(events, frame_rate)
+        async for event in events:
+            if event["type"] == "end":
+                return
+            if typed:
+                # On top of the dict path, the stages above all work on dicts
+                yield from_event(event)
+            elif serialize:
+                yield json.dumps(event)
+            else:
+                yield event
+
+    async def _events(
+        self, *, wait: int, timeout: int, cache: TailCache | None
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        key, control = self.key(), self.key_control()
+        counter, last_id, control_id = 0, "0", "0"
+        # Control events delivered from one lane and still expected on the other
+        seen = {key: 0, control: 0}
+
+        def fresh(lane: str, event: dict[str, Any]) -> bool:
+            if not self.control_lane or event["type"] not in CONTROL_TYPES:
+                return True
+            if seen[lane]:
+                seen[lane] -= 1
+                return False
+            seen[control if lane == key else key] += 1
+            return True
+
+        if cache is not None:
+            for last_id, event in await self._cached(cache):
+                if fresh(key, event):
+                    yield event
         while True:
-            res = await self.redis.xread({self.key(): last_id}, block=1000)
+            if self.control_lane:
+                res = await self._transport.read(
+                    {control: control_id, key: last_id},
+                    block=1000,
+                    count=CONTROL_PAGE,
+                )
+            else:
+                res = await self._transport.read({key: last_id}, block=1000)
             if len(res) == 0:
                 if (last_id == "0" and counter >= wait) or (
                     last_id != "0" and counter >= timeout
@@ -214,25 +491,84 @@ class Deps(ABC):
                 counter += 1
                 continue
             counter = 0
-            for _, entries in res:
-                for entry_id, entry in entries:
-                    last_id = (
-                        entry_id if isinstance(entry_id, str) else entry_id.decode()
-                    )
-                    ev_type = entry[b"type"].decode()
-                    if ev_type == "end":
-                        return
-                    ev_origin = entry[b"origin"].decode()
-                    ev_body: dict[str, Any] = json.loads(entry.get(b"body", "{}"))
-                    event: dict[str, Any] = {
-                        "type": ev_type,
-                        "origin": ev_origin,
-                        "body": ev_body,
-                    }
-                    if serialize:
-                        yield json.dumps(event)
-                    else:
+            # Control entries jump ahead of whatever backlog the page holds
+            for lane, batch in sorted(res, key=lambda r: r[0] != control):
+                if lane == control:
+                    for control_id, event in batch:
+                        if fresh(control, event):
+                            yield event
+                    continue
+                if cache is not None:
+                    cache.extend(key, last_id, batch)
+                for last_id, event in batch:
+                    if fresh(key, event):
                         yield event
 
+    async def _cached(self, cache: TailCache) -> list[Entry]:
+        key = self.key()
+        base, cached = cache.snapshot(key)
+        if not cached:
+            return []
+        # Check the cached tail still belongs to the stream living under this key
+        if base == "0":
+            head: list[Entry] = []
+            first = await self._transport.range(key, count=1)
+            valid = bool(first) and first[0][0] == cached[0][0]
+        else:
+            head = await self._transport.range(key, "-", base)
+            valid = bool(head) and head[-1][0] == base
+        if not valid:
+            cache.drop(key)
+            return []
+        return head + cached
+
     async def cancel(self) -> bool:
-        return await self.redis.getdel(self.key_live()) is not None
+        return await self._transport.pop_flag(self.key_live())
+
+
+def _split_utf8(data: bytes, size: int) -> list[str]:
+    # Byte-sized chunks, cut only at character boundaries
+    chunks: list[str] = []
+    start = 0
+    while start < len(data):
+        end = min(start + size, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        if end == start:
+            # A single character wider than the budget
+            end = start + 1
+            while end < len(data) and data[end] & 0xC0 == 0x80:
+                end += 1
+        chunks.append(data[start:end].decode())
+        start = end
+    return chunks
+
+
+async def reassemble_chunks(
+    events: AsyncGenerator[dict[str, Any], None],
+) -> AsyncGenerator[dict[str, Any], None]:
+    pending: dict[tuple[int, str], tuple[dict[str, Any], list[str]]] = {}
+    async for event in events:
+        body = event["body"]
+        if event["type"] != "event":
+            yield event
+        elif body.get("event") == "part_start" and "chunks" in body:
+            pending[body["idx"], body["tool_call_id"]] = (event, [])
+        elif body.get("event") == "part_chunk":
+            k = (body["idx"], body["tool_call_id"])
+            if k not in pending:
+                continue
+            start, chunks = pending[k]
+            chunks.append(body["content_delta"])
+            if len(chunks) == start["body"]["chunks"]:
+                del pending[k]
+                merged = dict(start["body"])
+                del merged["chunks"]
+                text = "".join(chunks)
+                if merged.pop("content_encoding") == "json":
+                    merged["content"] = json.loads(text)
+                else:
+                    merged["content"] = text
+                yield start | {"body": merged}
+        else:
+            yield event
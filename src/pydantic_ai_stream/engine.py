@@ -0,0 +1,256 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import suppress
+from typing import Any
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage
+
+from .checkpoint import Checkpoints
+from .deps import Deps
+from .response_cache import ResponseCache, rendered_prompt
+from .session import Session
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AgxCanceledError(Exception):
+    pass
+
+
+async def run(
+    session: Session,
+    agent: Any,
+    user_prompt: str,
+    deps: Deps,
+    *,
+    history_budget: int | None = None,
+    prewarm: Callable[[], Awaitable[Any]] | None = None,
+    response_cache: ResponseCache | None = None,
+    checkpoints: Checkpoints | None = None,
+    **kwargs: Any,
+) -> None:
+    await _run_turns(
+        session,
+        agent,
+        _single(user_prompt),
+        deps,
+        prewarm=prewarm,
+        checkpoints=checkpoints,
+        history_budget=history_budget,
+        response_cache=response_cache,
+        **kwargs,
+    )
+
+
+async def resume(
+    session: Session,
+    agent: Any,
+    deps: Deps,
+    checkpoints: Checkpoints,
+    *,
+    history_budget: int | None = None,
+    prewarm: Callable[[], Awaitable[Any]] | None = None,
+    **kwargs: Any,
+) -> bool:
+    checkpoint = await checkpoints.load(deps)
+    if checkpoint is None:
+        return False
+    deps.runtime = checkpoint.runtime
+    await _run_turns(
+        session,
+        agent,
+        _single(None),
+        deps,
+        prewarm=prewarm,
+        checkpoints=checkpoints,
+        history_budget=history_budget,
+        partial=checkpoint.msgs,
+        **kwargs,
+    )
+    return True
+
+
+async def _single(user_prompt: str | None) -> AsyncIterator[str | None]:
+    yield user_prompt
+
+
+async def _run_turns(
+    session: Session,
+    agent: Any,
+    prompts: AsyncIterator[str | None],
+    deps: Deps,
+    *,
+    prewarm: Callable[[], Awaitable[Any]] | None = None,
+    checkpoints: Checkpoints | None = None,
+    partial: list[ModelMessage] | None = None,
+    started: bool = False,
+    **kwargs: Any,
+) -> None:
+    # One load, stream and save around any number of consecutive turns, the
+    # stream is already open for runs that waited in a Runner queue
+    await _startup(session, deps, prewarm, started)
+    try:
+        async for user_prompt in prompts:
+            await _cancelable(
+                deps,
+                _turn(
+                    session,
+                    agent,
+                    user_prompt,
+                    deps,
+                    checkpoints=checkpoints,
+                    partial=partial or [],
+                    **kwargs,
+                ),
+            )
+            partial = None
+        await session.save()
+        if checkpoints is not None:
+            await checkpoints.clear(deps)
+    except AgxCanceledError:
+        await deps.add_error({"msg": "canceled"})
+        raise
+    except Exception as e:
+        await deps.add_error({"msg": f"crashed - {e}"})
+        raise
+    finally:
+        await deps.stop()
+
+
+async def _cancelable(deps: Deps, turn: Awaitable[None]) -> None:
+    # Cancels the turn mid-stream, model requests and running tools included,
+    # as soon as the live flag is gone rather than at the next node boundary
+    task = asyncio.ensure_future(turn)
+    watcher = asyncio.create_task(_watch(deps))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        watcher.result()
+        await deps.add_node_canceled()
+        raise AgxCanceledError()
+    finally:
+        # Also reached when the caller itself is canceled, nothing may outlive it
+        for pending in (task, watcher):
+            pending.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+
+
+async def _watch(deps: Deps) -> None:
+    while await deps.is_live():
+        await asyncio.sleep(settings.cancel_poll_interval)
+
+
+async def _turn(
+    session: Session,
+    agent: Any,
+    user_prompt: str | None,
+    deps: Deps,
+    *,
+    history_budget: int | None = None,
+    response_cache: ResponseCache | None = None,
+    checkpoints: Checkpoints | None = None,
+    partial: list[ModelMessage],
+    **kwargs: Any,
+) -> None:
+    history = session.history(history_budget)
+    digest = None
+    cacheable = response_cache is not None and user_prompt is not None
+    deps.recorded = [] if cacheable else None
+    try:
+        async with agent.iter(
+            user_prompt,
+            deps=deps,
+            message_history=history + partial,
+            **kwargs,
+        ) as agent_run:  # type: ignore[arg-type]
+            steps = 0
+            async for node in agent_run:
+                if not await deps.is_live():
+                    raise AgxCanceledError()
+                if (
+                    response_cache is not None
+                    and user_prompt is not None
+                    and digest is None
+                    and Agent.is_model_request_node(node)
+                ):
+                    # Keyed by the first request as rendered for these deps
+                    digest = await response_cache.digest(
+                        agent,
+                        history,
+                        user_prompt,
+                        deps=deps,
+                        rendered=await rendered_prompt(agent_run, node.request),
+                        run_kwargs=kwargs,
+                    )
+                    if (cached := await response_cache.get(digest)) is not None:
+                        deps.recorded = None
+                        await deps.add_recorded(cached.events)
+                        session.add_msgs(cached.msgs)
+                        return
+                if checkpoints is not None and steps % checkpoints.every == 0:
+                    # Tool returns only enter the history with the next request
+                    pending = (
+                        [node.request] if Agent.is_model_request_node(node) else []
+                    )
+                    if snapshot := partial + agent_run.new_messages() + pending:
+                        await checkpoints.save(deps, snapshot)
+                steps += 1
+                if Agent.is_model_request_node(node):
+                    await deps.add_node_begin(node)
+                    async with node.stream(agent_run.ctx) as node_stream:
+                        async for event in node_stream:
+                            await agent_run.ctx.deps.user_deps.add_node_event(event)
+                    await deps.add_node_end()
+                elif Agent.is_call_tools_node(node):
+                    async with node.stream(agent_run.ctx) as tools_stream:
+                        async for event in tools_stream:
+                            await deps.add_tool_event(event)
+            if agent_run.result is not None:
+                # Resuming re-sends the checkpoint's trailing request, so it is not new
+                new_msgs = partial + agent_run.result.new_messages()
+                session.add_msgs(new_msgs)
+                if response_cache is not None and digest is not None:
+                    await response_cache.put(digest, new_msgs, deps.recorded or [])
+    finally:
+        deps.recorded = None
+
+
+async def _startup(
+    session: Session,
+    deps: Deps,
+    prewarm: Callable[[], Awaitable[Any]] | None,
+    started: bool = False,
+) -> None:
+    # A failing prewarm only costs the warm-up, load and start failures are fatal
+    warming = asyncio.create_task(_prewarm(prewarm)) if prewarm is not None else None
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(session.load())
+            if not started:
+                tg.create_task(deps.start())
+    except BaseExceptionGroup as eg:
+        if warming is not None:
+            warming.cancel()
+            await asyncio.gather(warming, return_exceptions=True)
+        e = eg.exceptions[0]
+        # The stream may already be open, close it like a crashed run would
+        with suppress(Exception):
+            await deps.add_error({"msg": f"crashed - {e}"})
+            await deps.stop()
+        raise e from None
+    if warming is not None:
+        await warming
+
+
+async def _prewarm(prewarm: Callable[[], Awaitable[Any]]) -> None:
+    try:
+        await prewarm()
+    # Any failure of the user's warm-up only costs the warm-up
+    except Exception as e:  # noqa: BLE001
+        logger.warning(f"Prewarm failed - {e!r}")
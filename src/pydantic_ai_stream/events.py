@@ -0,0 +1,245 @@
+import json
+from dataclasses import dataclass, field, fields
+from types import UnionType
+from typing import Any, ClassVar, Union, get_args, get_origin
+
+from . import codec
+
+# Bumped whenever a field is removed or changes meaning, adding fields is compatible
+SCHEMA_VERSION = 1
+
+
+@dataclass(slots=True, kw_only=True)
+class StreamEvent:
+    schema_version: ClassVar[int] = SCHEMA_VERSION
+    origin: str
+
+
+@dataclass(slots=True, kw_only=True)
+class Begin(StreamEvent):
+    session_id: str | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class End(StreamEvent):
+    pass
+
+
+@dataclass(slots=True, kw_only=True)
+class Error(StreamEvent):
+    body: dict[str, Any]
+
+
+@dataclass(slots=True, kw_only=True)
+class Info(StreamEvent):
+    body: dict[str, Any]
+
+
+@dataclass(slots=True, kw_only=True)
+class NodeEvent(StreamEvent):
+    idx: int
+
+
+@dataclass(slots=True, kw_only=True)
+class LlmBegin(NodeEvent):
+    pass
+
+
+@dataclass(slots=True, kw_only=True)
+class LlmEnd(NodeEvent):
+    pass
+
+
+@dataclass(slots=True, kw_only=True)
+class Canceled(NodeEvent):
+    pass
+
+
+@dataclass(slots=True, kw_only=True)
+class Answer(NodeEvent):
+    pass
+
+
+@dataclass(slots=True, kw_only=True)
+class PartStart(NodeEvent):
+    part_kind: str
+    event_idx: int | None = None
+    content: Any = None
+    tool_name: str | None = None
+    tool_call_id: str | None = None
+    args: dict[str, Any] | None = None
+    chunks: int | None = None
+    content_encoding: str | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class PartDelta(NodeEvent):
+    event_idx: int
+    part_delta_kind: str
+    content_delta: str
+
+
+@dataclass(slots=True, kw_only=True)
+class PartChunk(NodeEvent):
+    tool_call_id: str
+    chunk_idx: int
+    content_delta: str
+
+
+@dataclass(slots=True, kw_only=True)
+class ToolStart(NodeEvent):
+    tool_name: str
+    tool_call_id: str
+
+
+@dataclass(slots=True, kw_only=True)
+class ToolProgress(NodeEvent):
+    tool_name: str | None
+    tool_call_id: str
+    extra: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True, kw_only=True)
+class ToolEnd(NodeEvent):
+    tool_name: str
+    tool_call_id: str
+    part_kind: str | None = None
+    duration_ms: float | None = None
+
+
+@dataclass(slots=True, kw_only=True)
+class Unknown(StreamEvent):
+    # Entries written by a newer producer, kept as is
+    type: str
+    body: dict[str, Any]
+
+
+TYPES: dict[str, type[StreamEvent]] = {
+    "begin": Begin,
+    "end": End,
+    "error": Error,
+    "info": Info,
+}
+
+EVENTS: dict[str, type[NodeEvent]] = {
+    "llm-begin": LlmBegin,
+    "llm-end": LlmEnd,
+    "canceled": Canceled,
+    "answer": Answer,
+    "part_start": PartStart,
+    "part_delta": PartDelta,
+    "part_chunk": PartChunk,
+    "tool-start": ToolStart,
+    "tool-progress": ToolProgress,
+    "tool-end": ToolEnd,
+}
+
+_FIELDS = {
+    cls: frozenset(f.name for f in fields(cls))
+    for cls in (*TYPES.values(), *EVENTS.values())
+}
+
+
+def _accepted(annotation: Any) -> tuple[type, ...] | None:
+    if get_origin(annotation) in (Union, UnionType):
+        args = get_args(annotation)
+    else:
+        args = (annotation,)
+    if Any in args:
+        return None
+    accepted = tuple(get_origin(arg) or arg for arg in args)
+    # JSON and msgpack both turn whole floats into ints
+    return accepted + (int,) if float in accepted else accepted
+
+
+# Field name -> runtime types a decoded value may have, None for Any
+_CHECKS = {
+    cls: {f.name: _accepted(f.type) for f in fields(cls) if f.name != "extra"}
+    for cls in _FIELDS
+}
+_FLOATS = {
+    cls: frozenset(name for name, ok in checks.items() if ok and float in ok)
+    for cls, checks in _CHECKS.items()
+}
+# Compact `event` codes -> classes, so msgpack entries skip the name lookup
+_EVENT_CODES = tuple(EVENTS.get(name) for name in codec.ENUMS["event"])
+_EVENT_KEY = codec.KEYS.index("event")
+
+
+def _event_class(type: str, event: Any) -> type[StreamEvent] | None:
+    if type != "event":
+        return TYPES.get(type)
+    if isinstance(event, int):
+        return _EVENT_CODES[event] if 0 <= event < len(_EVENT_CODES) else None
+    return EVENTS.get(event)
+
+
+def _build(
+    cls: type[StreamEvent], type: str, origin: str, kwargs: dict[str, Any]
+) -> StreamEvent:
+    checks = _CHECKS[cls]
+    for name, value in kwargs.items():
+        accepted = checks.get(name)
+        if accepted is not None and not isinstance(value, accepted):
+            raise ValueError(
+                f"Malformed {type} entry - {name} is {value.__class__.__name__}"
+            )
+        if name in _FLOATS[cls] and isinstance(value, int):
+            kwargs[name] = float(value)
+    try:
+        return cls(origin=origin, **kwargs)
+    except TypeError as e:
+        raise ValueError(f"Malformed {type} entry - {e}") from None
+
+
+def _from_body(
+    cls: type[StreamEvent] | None, type: str, origin: str, body: dict[str, Any]
+) -> StreamEvent:
+    if cls is None:
+        return Unknown(origin=origin, type=type, body=body)
+    if cls is Error or cls is Info:
+        return cls(origin=origin, body=body)  # type: ignore[call-arg]
+    names = _FIELDS[cls]
+    kwargs = {k: v for k, v in body.items() if k in names}
+    if cls is ToolProgress:
+        kwargs["extra"] = {
+            k: v for k, v in body.items() if k not in names and k != "event"
+        }
+    return _build(cls, type, origin, kwargs)
+
+
+def from_event(event: dict[str, Any]) -> StreamEvent:
+    type, origin, body = event["type"], event["origin"], event.get("body") or {}
+    return _from_body(_event_class(type, body.get("event")), type, origin, body)
+
+
+def decode(entry: dict[bytes, bytes]) -> StreamEvent:
+    # Builds the event straight from the raw fields, without the intermediate
+    # {type, origin, body} dict codec.decode() returns
+    version = entry.get(b"v")
+    if version is None:
+        type, origin = entry[b"type"].decode(), entry[b"origin"].decode()
+        raw = entry.get(b"body")
+        body = json.loads(raw) if raw else {}
+        return _from_body(_event_class(type, body.get("event")), type, origin, body)
+    if int(version) != codec.VERSION:
+        raise ValueError(f"Unsupported stream entry version - {version!r}")
+    type_code, origin_code, compact = codec._msgpack().unpackb(
+        entry[b"m"], strict_map_key=False
+    )
+    type = codec._unpack(codec.TYPES, type_code)
+    origin = codec._unpack(codec.ORIGINS, origin_code)
+    compact = compact or {}
+    cls = _event_class(type, compact.get(_EVENT_KEY))
+    if cls is None or cls is Error or cls is Info or cls is ToolProgress:
+        return _from_body(cls, type, origin, codec._unpack_body(compact))
+    # Known events only keep their own fields, codes are resolved for those alone
+    names = _FIELDS[cls]
+    kwargs: dict[str, Any] = {}
+    for k, v in compact.items():
+        name = codec._unpack(codec.KEYS, k)
+        if name in names:
+            if name in codec.ENUMS and isinstance(v, int):
+                v = codec.ENUMS[name][v]
+            kwargs[name] = v
+    return _build(cls, type, origin, kwargs)
@@ -0,0 +1,72 @@
+import json
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from math import ceil
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.usage import RunUsage
+
+from .settings import settings
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+@dataclass(kw_only=True)
+class MsgsIndex:
+    nbytes: list[int] = field(default_factory=list)
+    ntokens: list[int] = field(default_factory=list)
+    cum_bytes: list[int] = field(default_factory=list)
+    cum_tokens: list[int] = field(default_factory=list)
+    usage: RunUsage = field(default_factory=RunUsage)
+
+    def __len__(self) -> int:
+        return len(self.nbytes)
+
+    @property
+    def total_bytes(self) -> int:
+        return self.cum_bytes[-1] if self.cum_bytes else 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.cum_tokens[-1] if self.cum_tokens else 0
+
+    def extend(self, msgs: list[ModelMessage], sizes: list[int] | None = None) -> None:
+        for i, msg in enumerate(msgs):
+            if sizes is not None:
+                nbytes = sizes[i]
+            else:
+                # Strip the enclosing list brackets
+                nbytes = len(ModelMessagesTypeAdapter.dump_json([msg])) - 2
+            ntokens = ceil(nbytes / settings.bytes_per_token)
+            if isinstance(msg, ModelResponse):
+                self.usage.requests += 1
+                self.usage.incr(msg.usage)
+                if msg.usage.output_tokens:
+                    ntokens = msg.usage.output_tokens
+            self.nbytes.append(nbytes)
+            self.ntokens.append(ntokens)
+            self.cum_bytes.append(self.total_bytes + nbytes)
+            self.cum_tokens.append(self.total_tokens + ntokens)
+
+    def start_for_budget(self, max_tokens: int) -> int:
+        # First message index whose suffix fits into `max_tokens`
+        excess = self.total_tokens - max_tokens
+        if excess <= 0:
+            return 0
+        return bisect_left(self.cum_tokens, excess) + 1
+
+
+def json_sizes(data: bytes) -> list[int]:
+    # Byte size of each element of a JSON array, found in one pass of the C
+    # scanner instead of re-serializing every message
+    text = data.decode()
+    is_ascii = text.isascii()
+    sizes: list[int] = []
+    pos = _SEPARATORS.match(text, text.index("[") + 1).end()
+    while text[pos] != "]":
+        _, end = _decoder.raw_decode(text, pos)
+        sizes.append(end - pos if is_ascii else len(text[pos:end].encode()))
+        pos = _SEPARATORS.match(text, end).end()
+    return sizes
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, Iterable
+from typing import Any
+
+from redis.asyncio import Redis as AsyncRedis
+
+from .settings import settings
+from .transport import RedisTransport, Transport
+
+
+def _transport(redis: AsyncRedis | Transport) -> Transport:
+    return redis if isinstance(redis, Transport) else RedisTransport(redis=redis)
+
+
+async def q(
+    redis: AsyncRedis | Transport,
+    scope_id: int,
+    user_id: int,
+) -> AsyncGenerator[tuple[int, int, str], None]:
+    async for key_str in _transport(redis).scan(
+        f"{settings.redis_prefix}:{scope_id}:{user_id}:*:live"
+    ):
+        parts = key_str.rsplit(":", 4)
+        if len(parts) >= 4:
+            _, s_id, u_id, sess_id = parts[0], parts[-4], parts[-3], parts[-2]
+            yield int(s_id), int(u_id), sess_id
+
+
+async def listen_many(
+    redis: AsyncRedis | Transport,
+    *,
+    keys: Iterable[str] = (),
+    scope_id: int | None = None,
+    user_id: int | None = None,
+    refresh: float = 5,
+    timeout: int = 60,
+    serialize: bool = True,
+) -> AsyncGenerator[dict[str, Any] | str, None]:
+    transport = _transport(redis)
+    streams = dict.fromkeys(keys, "0")
+    # Sessions that ended, with the id of their end entry to resume from on restart
+    ended: dict[str, str] = {}
+    counter, refreshed = 0, float("-inf")
+    while True:
+        if scope_id is not None and user_id is not None:
+            if time.monotonic() - refreshed >= refresh:
+                refreshed = time.monotonic()
+                async for s_id, u_id, sess_id in q(transport, scope_id, user_id):
+                    key = f"{settings.redis_prefix}:{s_id}:{u_id}:{sess_id}"
+                    if key not in streams:
+                        streams[key] = ended.pop(key, "0")
+        elif not streams:
+            return
+        if streams:
+            res = await transport.read(streams, block=1000)
+        else:
+            res = []
+            await asyncio.sleep(1)
+        if not res:
+            if counter >= timeout:
+                return
+            counter += 1
+            continue
+        counter = 0
+        for key, batch in res:
+            session_id = key.rsplit(":", 1)[-1]
+            for entry_id, event in batch:
+                streams[key] = entry_id
+                event = event | {"session_id": session_id}
+                if event["type"] == "end":
+                    ended[key] = streams.pop(key)
+                yield json.dumps(event) if serialize else event
+                if key not in streams:
+                    break
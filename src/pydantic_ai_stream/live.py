@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Any, Self
+
+from redis.exceptions import RedisError
+
+from .cache import Entry
+from .settings import settings
+from .transport import RedisTransport, Transport, _decode_id, key_flags_channel
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True)
+class LiveCache(Transport):
+    transport: RedisTransport
+    retry: float = 1
+    flags: set[str] = field(default_factory=set)
+    # Flags with a TTL, Redis drops them silently so they are looked up there
+    expiring: set[str] = field(default_factory=set)
+    synced: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._follow())
+        await self.synced.wait()
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.synced.clear()
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
+
+    async def _follow(self) -> None:
+        pattern = f"{settings.redis_prefix}:*:live"
+        while True:
+            pubsub = self.transport.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(key_flags_channel())
+                # Changes published while scanning queue up on the subscription
+                # and are applied on top of the snapshot
+                await self._snapshot(pattern)
+                self.synced.set()
+                async for message in pubsub.listen():
+                    self._apply(_decode_id(message["data"]))
+            except RedisError as e:
+                logger.warning(f"Live flag subscription lost - {e!r}")
+                self.synced.clear()
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(self.retry)
+
+    async def _snapshot(self, pattern: str) -> None:
+        keys = [key async for key in self.transport.scan(pattern)]
+        async with self.transport.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.ttl(key)
+            ttls = await pipe.execute()
+        self.flags = {key for key, ttl in zip(keys, ttls, strict=True) if ttl != -2}
+        self.expiring = {key for key, ttl in zip(keys, ttls, strict=True) if ttl >= 0}
+
+    def _apply(self, change: str) -> None:
+        op, key = change[0], change[1:]
+        if op == "+":
+            self.flags.add(key)
+            self.expiring.discard(key)
+        elif op == "~":
+            self.expiring.add(key)
+        else:
+            self.flags.discard(key)
+            self.expiring.discard(key)
+
+    async def _check(self, key: str) -> bool:
+        if await self.transport.has_flag(key):
+            return True
+        self.flags.discard(key)
+        self.expiring.discard(key)
+        return False
+
+    async def add(
+        self, key: str, *, type: str, origin: str, body: dict[str, Any] | None
+    ) -> str:
+        return await self.transport.add(key, type=type, origin=origin, body=body)
+
+    async def read(
+        self, streams: dict[str, str], *, block: int, count: int | None = None
+    ) -> list[tuple[str, list[Entry]]]:
+        return await self.transport.read(streams, block=block, count=count)
+
+    async def range(
+        self, key: str, start: str = "-", end: str = "+", count: int | None = None
+    ) -> list[Entry]:
+        return await self.transport.range(key, start, end, count)
+
+    @property
+    def raw_json(self) -> bool:
+        return self.transport.raw_json
+
+    async def set_flag(self, key: str) -> None:
+        await self.transport.set_flag(key)
+        self.flags.add(key)
+        self.expiring.discard(key)
+
+    async def has_flag(self, key: str) -> bool:
+        if not self.synced.is_set():
+            return await self.transport.has_flag(key)
+        if key in self.expiring:
+            return await self._check(key)
+        return key in self.flags
+
+    async def pop_flag(self, key: str) -> bool:
+        self.flags.discard(key)
+        self.expiring.discard(key)
+        return await self.transport.pop_flag(key)
+
+    async def delete(self, key: str) -> None:
+        self.flags.discard(key)
+        self.expiring.discard(key)
+        await self.transport.delete(key)
+
+    async def expire(self, key: str, seconds: int) -> None:
+        await self.transport.expire(key, seconds)
+
+    async def expire_flag(self, key: str, seconds: int) -> None:
+        await self.transport.expire_flag(key, seconds)
+        self.expiring.add(key)
+
+    async def scan(self, pattern: str) -> AsyncGenerator[str, None]:
+        if not (self.synced.is_set() and pattern.endswith(":live")):
+            async for key in self.transport.scan(pattern):
+                yield key
+            return
+        for key in list(self.flags):
+            if not fnmatchcase(key, pattern):
+                continue
+            if key not in self.expiring or await self._check(key):
+                yield key
@@ -0,0 +1,55 @@
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from .settings import lock, settings
+
+T = TypeVar("T")
+
+_executor: Executor | None = None
+_executor_config: tuple[str, int | None] | None = None
+
+
+def get_executor() -> Executor | None:
+    global _executor, _executor_config
+    config = (settings.offload, settings.offload_workers)
+    if config == _executor_config:
+        return _executor
+    with lock:
+        if config != _executor_config:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            if settings.offload == "thread":
+                _executor = ThreadPoolExecutor(
+                    settings.offload_workers, thread_name_prefix="pyaix-offload"
+                )
+            elif settings.offload == "process":
+                _executor = ProcessPoolExecutor(
+                    settings.offload_workers, mp_context=mp_context()
+                )
+            else:
+                _executor = None
+            _executor_config = config
+    return _executor
+
+
+def mp_context() -> multiprocessing.context.BaseContext:
+    # Forking a process that runs an event loop and worker threads can deadlock
+    return multiprocessing.get_context("spawn")
+
+
+def shutdown() -> None:
+    global _executor, _executor_config
+    with lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor, _executor_config = None, None
+
+
+async def offload(fn: Callable[..., T], *args: Any, inline: bool = False) -> T:
+    executor = None if inline else get_executor()
+    if executor is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
@@ -0,0 +1,74 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+
+_DONE = object()
+
+
+def _delta_key(event: dict[str, Any]) -> tuple[Any, ...] | None:
+    body = event["body"]
+    if event["type"] != "event" or body.get("event") != "part_delta":
+        return None
+    if "content_delta" not in body:
+        return None
+    return event.get("session_id"), body.get("idx"), body.get("event_idx")
+
+
+async def pace(
+    events: AsyncGenerator[dict[str, Any], None], rate: float
+) -> AsyncGenerator[dict[str, Any], None]:
+    loop = asyncio.get_running_loop()
+    interval = 1 / rate
+    queue: asyncio.Queue[Any] = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        # Handed over to the consumer, which re-raises it in order
+        except Exception as e:  # noqa: BLE001
+            await queue.put(e)
+        await queue.put(_DONE)
+
+    task = asyncio.create_task(pump())
+    # Deltas waiting for the next frame, merged per part in arrival order
+    pending: dict[tuple[Any, ...], dict[str, Any]] = {}
+    flushed = float("-inf")
+    try:
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                deadline = flushed + interval
+                if pending and loop.time() >= deadline:
+                    for event in pending.values():
+                        yield event
+                    pending.clear()
+                    flushed = loop.time()
+                    continue
+                timeout = deadline - loop.time() if pending else None
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except TimeoutError:
+                    continue
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            key = _delta_key(item)
+            if key is None:
+                # Structural events go out at once, behind the deltas they follow
+                for event in pending.values():
+                    yield event
+                pending.clear()
+                flushed = loop.time()
+                yield item
+            elif key in pending:
+                merged = pending[key]["body"]
+                merged["content_delta"] += item["body"]["content_delta"]
+            else:
+                pending[key] = item | {"body": dict(item["body"])}
+        for event in pending.values():
+            yield event
+    finally:
+        task.cancel()
@@ -0,0 +1,75 @@
+import json
+from collections.abc import Iterable
+from typing import Any
+
+from . import codec
+from .offload import offload
+from .settings import settings
+
+# Body keys describing the position of an event rather than the part itself
+_POSITION = ("idx", "event", "event_idx", "chunks", "content_encoding")
+
+
+def _event(entry: dict[Any, Any]) -> dict[str, Any]:
+    return codec.decode(entry) if b"type" in entry or b"v" in entry else entry
+
+
+def nodes_from_entries(
+    entries: Iterable[tuple[Any, dict[Any, Any]]],
+) -> list[dict[str, Any]]:
+    requests: dict[int, list[dict[str, Any]]] = {}
+    responses: dict[int, dict[int, dict[str, Any]]] = {}
+    texts: dict[tuple[int, int], list[str]] = {}
+    chunked: dict[tuple[int, str], tuple[dict[str, Any], list[str], str]] = {}
+    for _, entry in entries:
+        event = _event(entry)
+        if event["type"] != "event":
+            continue
+        body = event["body"]
+        kind, idx = body.get("event"), body.get("idx", 0)
+        if kind == "llm-begin":
+            requests.setdefault(idx, [])
+            responses.setdefault(idx, {})
+        elif kind == "part_start":
+            part = {k: v for k, v in body.items() if k not in _POSITION}
+            part["signature"] = None
+            if "event_idx" not in body:
+                requests.setdefault(idx, []).append(part)
+                if "chunks" in body:
+                    k = (idx, body["tool_call_id"])
+                    chunked[k] = (part, [], body["content_encoding"])
+                continue
+            responses.setdefault(idx, {})[body["event_idx"]] = part
+            if "content" in body:
+                texts[idx, body["event_idx"]] = [body["content"]]
+        elif kind == "part_delta":
+            deltas = texts.get((idx, body["event_idx"]))
+            if deltas is not None:
+                deltas.append(body["content_delta"])
+        elif kind == "part_chunk":
+            pending = chunked.get((idx, body["tool_call_id"]))
+            if pending is not None:
+                pending[1].append(body["content_delta"])
+    for (idx, event_idx), deltas in texts.items():
+        responses[idx][event_idx]["content"] = "".join(deltas)
+    for part, chunks, encoding in chunked.values():
+        text = "".join(chunks)
+        part["content"] = json.loads(text) if encoding == "json" else text
+    return [
+        {
+            "kind": None,
+            "parts": requests.get(idx, [])
+            + [parts[event_idx] for event_idx in sorted(parts)],
+        }
+        for idx, parts in sorted(responses.items())
+    ]
+
+
+async def anodes_from_entries(
+    entries: list[tuple[Any, dict[Any, Any]]],
+) -> list[dict[str, Any]]:
+    return await offload(
+        nodes_from_entries,
+        entries,
+        inline=len(entries) < settings.offload_min_msgs,
+    )
@@ -0,0 +1,164 @@
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ThinkingPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from redis.asyncio import Redis as AsyncRedis
+
+from .cache import stream_id
+from .deps import Deps
+from .transport import RedisTransport, Transport
+
+
+@dataclass(kw_only=True)
+class Recorded:
+    offset: float
+    type: str
+    origin: str
+    body: dict[str, Any]
+
+
+async def record_stream(
+    redis: AsyncRedis | Transport, key: str, *, page: int = 1000
+) -> list[Recorded]:
+    transport = redis if isinstance(redis, Transport) else RedisTransport(redis=redis)
+    events: list[Recorded] = []
+    start, t0 = "-", None
+    while batch := await transport.range(key, start, "+", count=page):
+        for entry_id, event in batch:
+            ms = stream_id(entry_id)[0]
+            t0 = ms if t0 is None else t0
+            events.append(Recorded(offset=(ms - t0) / 1000, **event))
+        start = f"({batch[-1][0]}"
+    return events
+
+
+def record_msgs(
+    msgs: list[ModelMessage], *, delta_chars: int | None = None
+) -> list[Recorded]:
+    events: list[Recorded] = []
+    t0 = ts = None
+
+    def emit(at: Any, type: str, body: dict[str, Any]) -> None:
+        nonlocal t0, ts
+        t0 = at if t0 is None else t0
+        ts = at
+        origin = "pydantic-ai" if type == "event" else "pydantic-ai-stream"
+        offset = (at - t0).total_seconds()
+        events.append(Recorded(offset=offset, type=type, origin=origin, body=body))
+
+    idx = -1
+    for msg in msgs:
+        if isinstance(msg, ModelRequest):
+            at = getattr(msg, "timestamp", None) or min(
+                (p.timestamp for p in msg.parts if hasattr(p, "timestamp")),
+                default=ts,
+            )
+            if idx == -1:
+                emit(at, "begin", {})
+            idx += 1
+            emit(at, "event", {"idx": idx, "event": "llm-begin"})
+            for part in msg.parts:
+                if isinstance(part, ToolReturnPart):
+                    emit(
+                        at,
+                        "event",
+                        {
+                            "idx": idx,
+                            "event": "part_start",
+                            "part_kind": part.part_kind,
+                            "tool_name": part.tool_name,
+                            "tool_call_id": part.tool_call_id,
+                            "content": part.content,
+                        },
+                    )
+        elif isinstance(msg, ModelResponse):
+            at = msg.timestamp
+            for i, part in enumerate(msg.parts):
+                body: dict[str, Any] = {"idx": idx, "event_idx": i}
+                if isinstance(part, (TextPart, ThinkingPart)):
+                    size = delta_chars or len(part.content) or 1
+                    deltas = [
+                        part.content[j : j + size]
+                        for j in range(0, len(part.content), size)
+                    ] or [""]
+                    emit(
+                        at,
+                        "event",
+                        body
+                        | {
+                            "event": "part_start",
+                            "part_kind": part.part_kind,
+                            "content": deltas[0],
+                        },
+                    )
+                    for delta in deltas[1:]:
+                        emit(
+                            at,
+                            "event",
+                            body
+                            | {
+                                "event": "part_delta",
+                                "part_delta_kind": part.part_kind,
+                                "content_delta": delta,
+                            },
+                        )
+                elif isinstance(part, ToolCallPart):
+                    emit(
+                        at,
+                        "event",
+                        body
+                        | {
+                            "event": "part_start",
+                            "part_kind": part.part_kind,
+                            "tool_name": part.tool_name,
+                            "tool_call_id": part.tool_call_id,
+                            "args": part.args_as_dict(),
+                        },
+                    )
+            emit(at, "event", {"idx": idx, "event": "llm-end"})
+    if events:
+        emit(ts, "end", {})
+    return events
+
+
+async def replay(deps: Deps, events: list[Recorded], *, speed: float = 1.0) -> None:
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for event in events:
+        if speed > 0:
+            delay = event.offset / speed - (loop.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if event.type == "begin":
+            await deps.start()
+        elif event.type == "end":
+            await deps.stop()
+        else:
+            await deps.add(type=event.type, origin=event.origin, body=event.body)
+
+
+async def replay_many(
+    make_deps: Callable[[int], Deps],
+    events: list[Recorded],
+    *,
+    runs: int,
+    speed: float = 1.0,
+    concurrency: int | None = None,
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency or runs)
+
+    async def one(n: int) -> None:
+        async with semaphore:
+            await replay(make_deps(n), events, speed=speed)
+
+    await asyncio.gather(*(one(n) for n in range(runs)))
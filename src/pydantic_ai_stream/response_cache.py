@@ -0,0 +1,153 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic_ai._agent_graph import _get_instructions, build_run_context
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    SystemPromptPart,
+)
+from redis.asyncio import Redis as AsyncRedis
+
+from .offload import offload
+from .session import _dump_msgs
+from .settings import settings
+
+
+def agent_id(agent: Any, model: Any = None) -> str:
+    model = model if model is not None else getattr(agent, "model", None)
+    if model is not None and not isinstance(model, str):
+        name = getattr(model, "model_name", type(model).__name__)
+        model = f"{getattr(model, 'system', '')}:{name}"
+    return f"{getattr(agent, 'name', None) or ''}/{model or ''}"
+
+
+def _stable(value: Any) -> str:
+    # Functions and types by qualified name, anything else by repr, an unstable
+    # repr only costs a miss, never a wrong hit
+    value = getattr(value, "instruction", getattr(value, "function", value))
+    if isinstance(value, str):
+        return value
+    if isinstance(value, type) or callable(value):
+        module = getattr(value, "__module__", "")
+        return f"{module}.{getattr(value, '__qualname__', repr(value))}"
+    return repr(value)
+
+
+def agent_fingerprint(agent: Any, run_kwargs: dict[str, Any] | None = None) -> bytes:
+    # Everything the agent adds to the request besides the history and prompt,
+    # two unnamed agents on the same model must not share entries
+    run_kwargs = run_kwargs or {}
+    tools = getattr(getattr(agent, "_function_toolset", None), "tools", {})
+    return json.dumps(
+        {
+            "id": agent_id(agent, run_kwargs.get("model")),
+            "system_prompts": list(getattr(agent, "_system_prompts", ())),
+            "system_prompt_functions": [
+                _stable(f) for f in getattr(agent, "_system_prompt_functions", ())
+            ],
+            "instructions": [_stable(i) for i in getattr(agent, "_instructions", ())],
+            "tools": {
+                name: [tool.description, tool.function_schema.json_schema]
+                for name, tool in tools.items()
+            },
+            "output_type": _stable(getattr(agent, "output_type", None)),
+            "model_settings": getattr(agent, "model_settings", None),
+            "run": {k: v for k, v in run_kwargs.items() if k != "model"},
+        },
+        sort_keys=True,
+        default=_stable,
+    ).encode()
+
+
+async def rendered_prompt(agent_run: Any, request: ModelRequest) -> bytes:
+    # What the request will actually carry, dynamic parts depend on deps and
+    # are only rendered per run; instructions are otherwise added at send time
+    ctx = agent_run.ctx
+    instructions = await _get_instructions(ctx, build_run_context(ctx)) or []
+    return json.dumps(
+        {
+            "system_prompts": [
+                part.content
+                for part in request.parts
+                if isinstance(part, SystemPromptPart)
+            ],
+            "instructions": [part.content for part in instructions],
+        },
+        default=_stable,
+    ).encode()
+
+
+@dataclass(kw_only=True)
+class Cached:
+    events: list[dict[str, Any]]
+    msgs: list[ModelMessage]
+
+
+@dataclass(kw_only=True)
+class ResponseCache:
+    redis: AsyncRedis
+    ttl: int = 3600
+    namespace: str = ""
+    shared: bool = False
+
+    def key(self, digest: str) -> str:
+        return f"{settings.redis_prefix}:responses:{digest}"
+
+    async def digest(
+        self,
+        agent: Any,
+        history: list[ModelMessage],
+        user_prompt: str,
+        *,
+        deps: Any = None,
+        rendered: bytes = b"",
+        run_kwargs: dict[str, Any] | None = None,
+    ) -> str:
+        # Entries are private to the scope and user unless explicitly shared
+        owner = (
+            ""
+            if self.shared or deps is None
+            else f"{deps.get_scope_id()}:{deps.user_id}"
+        )
+        dumped = await offload(
+            _dump_msgs,
+            history,
+            inline=len(history) < settings.offload_min_msgs,
+        )
+        h = hashlib.sha256()
+        for part in (
+            self.namespace.encode(),
+            owner.encode(),
+            agent_fingerprint(agent, run_kwargs),
+            rendered,
+            dumped,
+            user_prompt.encode(),
+        ):
+            h.update(len(part).to_bytes(8, "big"))
+            h.update(part)
+        return h.hexdigest()
+
+    async def get(self, digest: str) -> Cached | None:
+        # Hits push the expiry back, so hot turns stay while cold ones age out
+        raw = await self.redis.getex(self.key(digest), ex=self.ttl)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return Cached(
+            events=data["events"],
+            msgs=ModelMessagesTypeAdapter.validate_python(data["msgs"]),
+        )
+
+    async def put(
+        self, digest: str, msgs: list[ModelMessage], events: list[dict[str, Any]]
+    ) -> None:
+        # Only the turn's own events, begin/end/errors belong to the replaying run
+        data = {
+            "events": events,
+            "msgs": ModelMessagesTypeAdapter.dump_python(msgs, mode="json"),
+        }
+        await self.redis.set(self.key(digest), json.dumps(data), ex=self.ttl)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from .deps import Deps
+from .engine import AgxCanceledError, _run_turns, _single
+from .session import Session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True, eq=False)
+class Pending:
+    session: Session
+    agent: Any
+    user_prompt: str
+    deps: Deps
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    future: asyncio.Future[None] = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    position: int = 0
+
+    @property
+    def scope_id(self) -> int:
+        return self.deps.get_scope_id()
+
+    @property
+    def user(self) -> tuple[int, int]:
+        return self.scope_id, self.deps.user_id
+
+
+@dataclass(kw_only=True)
+class Runner:
+    max_runs: int = 32
+    max_runs_per_scope: int | None = None
+    max_runs_per_user: int | None = 4
+    queued_ttl: int = 60
+    running: int = 0
+    running_per_scope: dict[int, int] = field(default_factory=dict)
+    running_per_user: dict[tuple[int, int], int] = field(default_factory=dict)
+    queue: deque[Pending] = field(default_factory=deque)
+    tasks: set[asyncio.Task[None]] = field(default_factory=set)
+    # Runs that were queued, their live flag expires unless kept alive
+    flagged: set[Pending] = field(default_factory=set)
+    keepalive: asyncio.Task[None] | None = None
+
+    def admissible(self, pending: Pending) -> bool:
+        if self.running >= self.max_runs:
+            return False
+        if (
+            self.max_runs_per_scope is not None
+            and self.running_per_scope.get(pending.scope_id, 0)
+            >= self.max_runs_per_scope
+        ):
+            return False
+        return (
+            self.max_runs_per_user is None
+            or self.running_per_user.get(pending.user, 0) < self.max_runs_per_user
+        )
+
+    def full(self) -> bool:
+        return self.running + len(self.queue) >= self.max_runs
+
+    async def submit(
+        self,
+        session: Session,
+        agent: Any,
+        user_prompt: str,
+        deps: Deps,
+        **kwargs: Any,
+    ) -> asyncio.Future[None]:
+        pending = Pending(
+            session=session,
+            agent=agent,
+            user_prompt=user_prompt,
+            deps=deps,
+            kwargs=kwargs,
+        )
+        pending.future.add_done_callback(_retrieve)
+        if self.admissible(pending):
+            self._start(pending)
+        else:
+            # Queued runs open their stream and hold the live flag right away, so
+            # they show up in q() and can be canceled; the flag's TTL outlives
+            # the runner only briefly if this process dies
+            await deps.start()
+            await deps.expire_live(self.queued_ttl)
+            self.flagged.add(pending)
+            if self.keepalive is None or self.keepalive.done():
+                self.keepalive = asyncio.create_task(self._keepalive())
+            self.queue.append(pending)
+            await self._publish_position(pending, len(self.queue))
+        return pending.future
+
+    async def join(self) -> None:
+        while self.tasks or self.queue:
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            else:
+                await asyncio.sleep(0)
+        if self.keepalive is not None:
+            await asyncio.gather(self.keepalive, return_exceptions=True)
+
+    def _start(self, pending: Pending, queued: bool = False) -> None:
+        self.running += 1
+        self.running_per_scope[pending.scope_id] = (
+            self.running_per_scope.get(pending.scope_id, 0) + 1
+        )
+        self.running_per_user[pending.user] = (
+            self.running_per_user.get(pending.user, 0) + 1
+        )
+        task = asyncio.create_task(self._execute(pending, queued))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _release(self, pending: Pending) -> None:
+        self.running -= 1
+        for counts, k in (
+            (self.running_per_scope, pending.scope_id),
+            (self.running_per_user, pending.user),
+        ):
+            counts[k] -= 1
+            if counts[k] == 0:
+                del counts[k]
+
+    async def _execute(self, pending: Pending, queued: bool) -> None:
+        try:
+            if queued and not await pending.deps.is_live():
+                await pending.deps.add_error({"msg": "canceled"})
+                await pending.deps.stop()
+                raise AgxCanceledError()
+            await _run_turns(
+                pending.session,
+                pending.agent,
+                _single(pending.user_prompt),
+                pending.deps,
+                started=queued,
+                **pending.kwargs,
+            )
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        # Whatever the run raised is handed to the submitter through the future
+        except Exception as e:  # noqa: BLE001
+            if not pending.future.done():
+                pending.future.set_exception(e)
+        else:
+            if not pending.future.done():
+                pending.future.set_result(None)
+        finally:
+            self._release(pending)
+            self.flagged.discard(pending)
+            if not self.flagged and self.keepalive is not None:
+                self.keepalive.cancel()
+            await self._drain()
+
+    async def _drain(self) -> None:
+        waiting: deque[Pending] = deque()
+        while self.queue:
+            pending = self.queue.popleft()
+            if self.admissible(pending):
+                self._start(pending, queued=True)
+            else:
+                waiting.append(pending)
+        self.queue = waiting
+        await asyncio.gather(
+            *(
+                self._publish_position(pending, position)
+                for position, pending in enumerate(self.queue, start=1)
+                if pending.position != position
+            )
+        )
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.queued_ttl / 3)
+            await asyncio.gather(
+                *(
+                    pending.deps.expire_live(self.queued_ttl)
+                    for pending in self.flagged
+                ),
+                return_exceptions=True,
+            )
+
+    async def _publish_position(self, pending: Pending, position: int) -> None:
+        pending.position = position
+        await pending.deps.add_info(
+            {"msg": "queued", "queue_position": position},
+            origin="pydantic-ai-stream",
+        )
+
+
+def _retrieve(future: asyncio.Future[None]) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.debug(f"Run failed - {future.exception()!r}")
@@ -3,21 +3,96 @@ from dataclasses import dataclass, field
 from itertools import chain
 from typing import Any
 
-from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, UserPromptPart
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    SystemPromptPart,
+    UserPromptPart,
+)
+from pydantic_ai.usage import RunUsage
+
+from .history import MsgsIndex, json_sizes
+from .offload import offload
+from .settings import settings
+
+
+def _dump_msgs(msgs: list[ModelMessage]) -> bytes:
+    return ModelMessagesTypeAdapter.dump_json(msgs)
+
+
+def _load_msgs(data: bytes) -> list[ModelMessage]:
+    return ModelMessagesTypeAdapter.validate_json(data)
+
+
+def _load_indexed(data: bytes) -> tuple[list[ModelMessage], MsgsIndex]:
+    msgs = _load_msgs(data)
+    index = MsgsIndex()
+    index.extend(msgs, json_sizes(data))
+    return msgs, index
+
+
+def _starts_turn(msg: ModelMessage) -> bool:
+    return isinstance(msg, ModelRequest) and any(
+        isinstance(part, UserPromptPart) for part in msg.parts
+    )
 
 
 @dataclass(kw_only=True)
 class Session(ABC):
     msgs: list[ModelMessage] = field(default_factory=list)
+    index: MsgsIndex = field(default_factory=MsgsIndex, repr=False, compare=False)
 
     def add_msgs(self, msgs: list[ModelMessage]) -> None:
         self.msgs.extend(msgs)
+        self.indexed()
+
+    def indexed(self) -> MsgsIndex:
+        # Catches up with messages appended to `msgs` directly; replacing `msgs`
+        # wholesale must go through msgs_from_json or reset the index
+        if len(self.index) > len(self.msgs):
+            self.index = MsgsIndex()
+        if len(self.index) < len(self.msgs):
+            self.index.extend(self.msgs[len(self.index) :])
+        return self.index
+
+    def usage(self) -> RunUsage:
+        return self.indexed().usage
+
+    def history(self, max_tokens: int | None = None) -> list[ModelMessage]:
+        if max_tokens is None:
+            return self.msgs
+        start = self.indexed().start_for_budget(max_tokens)
+        if start == 0:
+            return self.msgs
+        # Only cut in front of a user prompt, never between tool calls and returns
+        while start < len(self.msgs) and not _starts_turn(self.msgs[start]):
+            start += 1
+        system = [
+            part for part in self.msgs[0].parts if isinstance(part, SystemPromptPart)
+        ]
+        head: list[ModelMessage] = [ModelRequest(parts=system)] if system else []
+        return head + self.msgs[start:]
 
     def msgs_to_json(self) -> bytes:
-        return ModelMessagesTypeAdapter.dump_json(self.msgs)
+        return _dump_msgs(self.msgs)
 
     def msgs_from_json(self, data: bytes) -> None:
-        self.msgs = ModelMessagesTypeAdapter.validate_json(data)
+        self.msgs, self.index = _load_indexed(data)
+
+    async def amsgs_to_json(self) -> bytes:
+        return await offload(
+            _dump_msgs,
+            self.msgs,
+            inline=len(self.msgs) < settings.offload_min_msgs,
+        )
+
+    async def amsgs_from_json(self, data: bytes) -> None:
+        self.msgs, self.index = await offload(
+            _load_indexed,
+            data,
+            inline=len(data) < settings.offload_min_bytes,
+        )
 
     def get_user_prompt(self) -> str:
         if not self.msgs:
@@ -50,6 +125,14 @@ class Session(ABC):
                     node["parts"].append({**part, "signature": None})
         return nodes
 
+    @classmethod
+    async def anodes_from_msgs(cls, msgs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return await offload(
+            cls.nodes_from_msgs,
+            msgs,
+            inline=len(msgs) < settings.offload_min_msgs,
+        )
+
     @abstractmethod
     async def load(self) -> None:
         pass
@@ -1,4 +1,6 @@
 from threading import Lock
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 lock = Lock()
@@ -8,10 +10,46 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="pydantic_ai_stream")
 
     redis_prefix: str = "pyaix"
+    stream_codec: Literal["json", "msgpack"] = "json"
+    bytes_per_token: float = 4
+    tool_return_chunk_size: int = 64 * 1024
+    offload: Literal["inline", "thread", "process"] = "inline"
+    offload_workers: int | None = None
+    offload_min_bytes: int = 256 * 1024
+    offload_min_msgs: int = 200
+    cancel_poll_interval: float = 0.5
 
     def set_redis_prefix(self, prefix: str):
         with lock:
             self.redis_prefix = prefix
 
+    def set_stream_codec(self, codec: Literal["json", "msgpack"]):
+        with lock:
+            self.stream_codec = codec
+
+    def set_tool_return_chunk_size(self, size: int):
+        with lock:
+            self.tool_return_chunk_size = size
+
+    def set_cancel_poll_interval(self, seconds: float):
+        with lock:
+            self.cancel_poll_interval = seconds
+
+    def set_offload(
+        self,
+        mode: Literal["inline", "thread", "process"],
+        *,
+        workers: int | None = None,
+        min_bytes: int | None = None,
+        min_msgs: int | None = None,
+    ):
+        with lock:
+            self.offload = mode
+            self.offload_workers = workers
+            if min_bytes is not None:
+                self.offload_min_bytes = min_bytes
+            if min_msgs is not None:
+                self.offload_min_msgs = min_msgs
+
 
 settings = Settings()
@@ -0,0 +1,269 @@
+import asyncio
+import copy
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Any
+
+from redis.asyncio import Redis as AsyncRedis
+
+from . import codec
+from .cache import Entry, stream_id
+from .settings import settings
+
+
+class Transport(ABC):
+    # Whether bodies may carry codec.RawJSON values, spliced in without re-encoding
+    @property
+    def raw_json(self) -> bool:
+        return False
+
+    @abstractmethod
+    async def add(
+        self, key: str, *, type: str, origin: str, body: dict[str, Any] | None
+    ) -> str:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def read(
+        self, streams: dict[str, str], *, block: int, count: int | None = None
+    ) -> list[tuple[str, list[Entry]]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def range(
+        self, key: str, start: str = "-", end: str = "+", count: int | None = None
+    ) -> list[Entry]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def set_flag(self, key: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def has_flag(self, key: str) -> bool:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def pop_flag(self, key: str) -> bool:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def expire(self, key: str, seconds: int) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def scan(self, pattern: str) -> AsyncGenerator[str, None]:
+        raise NotImplementedError()
+
+    async def expire_flag(self, key: str, seconds: int) -> None:
+        await self.expire(key, seconds)
+
+
+def key_flags_channel() -> str:
+    return f"{settings.redis_prefix}:flags"
+
+
+def _decode_id(entry_id: bytes | str) -> str:
+    return entry_id if isinstance(entry_id, str) else entry_id.decode()
+
+
+def _decode_entries(entries: list[tuple[Any, dict[bytes, bytes]]]) -> list[Entry]:
+    return [(_decode_id(entry_id), codec.decode(entry)) for entry_id, entry in entries]
+
+
+def _copy(entry: Entry) -> Entry:
+    # Readers get their own body, like a decoded Redis entry, so a listener
+    # mutating an event cannot change what later readers see
+    entry_id, event = entry
+    return entry_id, {**event, "body": copy.deepcopy(event["body"])}
+
+
+@dataclass(kw_only=True)
+class RedisTransport(Transport):
+    redis: AsyncRedis
+
+    @property
+    def raw_json(self) -> bool:
+        return settings.stream_codec == "json"
+
+    async def add(
+        self, key: str, *, type: str, origin: str, body: dict[str, Any] | None
+    ) -> str:
+        fields = codec.encode(type, origin, body, settings.stream_codec)
+        return _decode_id(await self.redis.xadd(key, fields))  # type: ignore[arg-type]
+
+    async def read(
+        self, streams: dict[str, str], *, block: int, count: int | None = None
+    ) -> list[tuple[str, list[Entry]]]:
+        res = await self.redis.xread(streams, block=block, count=count)  # type: ignore[arg-type]
+        return [(_decode_id(key), _decode_entries(entries)) for key, entries in res]
+
+    async def range(
+        self, key: str, start: str = "-", end: str = "+", count: int | None = None
+    ) -> list[Entry]:
+        return _decode_entries(await self.redis.xrange(key, start, end, count=count))
+
+    # Flag changes are published so LiveCache instances can stay in sync
+    async def set_flag(self, key: str) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, 1)
+            pipe.publish(key_flags_channel(), f"+{key}")
+            await pipe.execute()
+
+    async def has_flag(self, key: str) -> bool:
+        return await self.redis.get(key) is not None
+
+    async def pop_flag(self, key: str) -> bool:
+        if await self.redis.getdel(key) is None:
+            return False
+        await self.redis.publish(key_flags_channel(), f"-{key}")
+        return True
+
+    async def delete(self, key: str) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.publish(key_flags_channel(), f"-{key}")
+            await pipe.execute()
+
+    async def expire(self, key: str, seconds: int) -> None:
+        await self.redis.expire(key, seconds)
+
+    # Expiries are not published, only announced, caches re-check such flags
+    async def expire_flag(self, key: str, seconds: int) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.expire(key, seconds)
+            pipe.publish(key_flags_channel(), f"~{key}")
+            await pipe.execute()
+
+    async def scan(self, pattern: str) -> AsyncGenerator[str, None]:
+        async for k in self.redis.scan_iter(pattern):
+            yield _decode_id(k)
+
+
+@dataclass(kw_only=True)
+class MemoryTransport(Transport):
+    max_entries: int = 10_000
+    streams: dict[str, deque[Entry]] = field(default_factory=dict)
+    flags: set[str] = field(default_factory=set)
+    expiries: dict[str, asyncio.TimerHandle] = field(default_factory=dict)
+    last_id: tuple[int, int] = (0, 0)
+    # Readers blocked on each key, an add only wakes those following its key
+    waiters: dict[str, set[asyncio.Event]] = field(default_factory=dict)
+
+    def _next_id(self) -> str:
+        ms, seq = int(time.time() * 1000), 0
+        if ms <= self.last_id[0]:
+            ms, seq = self.last_id[0], self.last_id[1] + 1
+        self.last_id = (ms, seq)
+        return f"{ms}-{seq}"
+
+    async def add(
+        self, key: str, *, type: str, origin: str, body: dict[str, Any] | None
+    ) -> str:
+        entry_id = self._next_id()
+        stream = self.streams.setdefault(key, deque(maxlen=self.max_entries))
+        stream.append((entry_id, {"type": type, "origin": origin, "body": body or {}}))
+        for woken in self.waiters.get(key, ()):
+            woken.set()
+        return entry_id
+
+    def _pending(
+        self, streams: dict[str, str], count: int | None
+    ) -> list[tuple[str, list[Entry]]]:
+        res = []
+        for key, last_id in streams.items():
+            after, entries = stream_id(last_id), []
+            for entry in reversed(self.streams.get(key, ())):
+                if stream_id(entry[0]) <= after:
+                    break
+                entries.append(entry)
+            if entries:
+                res.append((key, [_copy(entry) for entry in entries[::-1][:count]]))
+        return res
+
+    async def read(
+        self, streams: dict[str, str], *, block: int, count: int | None = None
+    ) -> list[tuple[str, list[Entry]]]:
+        deadline = time.monotonic() + block / 1000
+        while not (res := self._pending(streams, count)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            woken = asyncio.Event()
+            for key in streams:
+                self.waiters.setdefault(key, set()).add(woken)
+            try:
+                await asyncio.wait_for(woken.wait(), remaining)
+            except TimeoutError:
+                break
+            finally:
+                for key in streams:
+                    waiting = self.waiters[key]
+                    waiting.discard(woken)
+                    if not waiting:
+                        del self.waiters[key]
+        return res
+
+    async def range(
+        self, key: str, start: str = "-", end: str = "+", count: int | None = None
+    ) -> list[Entry]:
+        exclusive = start.startswith("(")
+        lo = (0, 0) if start == "-" else stream_id(start.lstrip("("))
+        hi = None if end == "+" else stream_id(end)
+        res = []
+        for entry in self.streams.get(key, ()):
+            sid = stream_id(entry[0])
+            if (sid > lo if exclusive else sid >= lo) and (hi is None or sid <= hi):
+                res.append(entry)
+        return [_copy(entry) for entry in res[:count]]
+
+    async def set_flag(self, key: str) -> None:
+        # Like SET, setting a flag clears its expiry
+        handle = self.expiries.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+        self.flags.add(key)
+
+    async def has_flag(self, key: str) -> bool:
+        return key in self.flags
+
+    async def pop_flag(self, key: str) -> bool:
+        if key not in self.flags:
+            return False
+        self.flags.discard(key)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self.streams.pop(key, None)
+        self.flags.discard(key)
+        handle = self.expiries.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+
+    async def expire(self, key: str, seconds: int) -> None:
+        if key not in self.streams and key not in self.flags:
+            return
+        handle = self.expiries.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+        self.expiries[key] = asyncio.get_running_loop().call_later(
+            seconds, self._expire, key
+        )
+
+    def _expire(self, key: str) -> None:
+        self.expiries.pop(key, None)
+        self.streams.pop(key, None)
+        self.flags.discard(key)
+
+    async def scan(self, pattern: str) -> AsyncGenerator[str, None]:
+        for key in list(dict.fromkeys([*self.streams, *self.flags])):
+            if fnmatchcase(key, pattern):
+                yield key
@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import os
+import socket
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from .deps import Deps
+from .runner import Runner
+from .session import Session
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True)
+class Job:
+    session_id: str
+    user_id: int
+    user_prompt: str
+    deps: dict[str, Any] = field(default_factory=dict)
+
+    def dumps(self) -> bytes:
+        return json.dumps(asdict(self)).encode()
+
+    @classmethod
+    def loads(cls, data: bytes | str) -> "Job":
+        return cls(**json.loads(data))
+
+
+def key_jobs(queue: str = "default") -> str:
+    return f"{settings.redis_prefix}:jobs:{queue}"
+
+
+async def enqueue(redis: AsyncRedis, job: Job, queue: str = "default") -> None:
+    await redis.lpush(key_jobs(queue), job.dumps())  # type: ignore[misc]
+
+
+@dataclass(kw_only=True)
+class Worker:
+    redis: AsyncRedis
+    agent: Any
+    make_session: Callable[[Job], Session]
+    make_deps: Callable[[Job], Deps]
+    runner: Runner = field(default_factory=Runner)
+    queue: str = "default"
+    worker_id: str = field(
+        default_factory=lambda: f"{socket.gethostname()}:{os.getpid()}"
+    )
+    block: float = 1
+    heartbeat_ttl: int = 30
+    acks: set[asyncio.Task[None]] = field(default_factory=set)
+
+    def key(self) -> str:
+        return key_jobs(self.queue)
+
+    def key_processing(self, worker_id: str | None = None) -> str:
+        worker_id = self.worker_id if worker_id is None else worker_id
+        return f"{self.key()}:processing:{worker_id}"
+
+    def key_heartbeat(self, worker_id: str | None = None) -> str:
+        worker_id = self.worker_id if worker_id is None else worker_id
+        return f"{self.key()}:workers:{worker_id}"
+
+    async def recover(self) -> int:
+        # Jobs left in our processing list were pulled by a previous incarnation
+        # that died, the lists of workers whose heartbeat expired are reaped too
+        # since a restarted worker usually comes back under another id
+        return await self._requeue(self.worker_id) + await self._reap()
+
+    async def _reap(self) -> int:
+        n = 0
+        prefix = self.key_processing("")
+        async for key in self.redis.scan_iter(match=f"{prefix}*"):
+            worker_id = key.decode()[len(prefix) :]
+            if worker_id == self.worker_id:
+                continue
+            if not await self.redis.exists(self.key_heartbeat(worker_id)):
+                n += await self._requeue(worker_id)
+        return n
+
+    async def _requeue(self, worker_id: str) -> int:
+        n = 0
+        while await self.redis.lmove(
+            self.key_processing(worker_id), self.key(), "LEFT", "RIGHT"
+        ):  # type: ignore[misc]
+            n += 1
+        if n:
+            logger.warning(f"Requeued {n} unfinished jobs from {worker_id}")
+        return n
+
+    async def _heartbeat(self) -> None:
+        beats = 0
+        while True:
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+            beats += 1
+            try:
+                await self.redis.set(self.key_heartbeat(), b"1", ex=self.heartbeat_ttl)
+                # Workers that died since startup are reaped by the survivors,
+                # our own list holds the jobs still running
+                if beats % 3 == 0:
+                    await self._reap()
+            except RedisError as e:
+                logger.warning(f"Worker heartbeat failed - {e!r}")
+
+    async def serve(self, *, max_jobs: int | None = None) -> None:
+        await self.redis.set(self.key_heartbeat(), b"1", ex=self.heartbeat_ttl)
+        await self.recover()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self._serve(max_jobs)
+        finally:
+            heartbeat.cancel()
+            with suppress(asyncio.CancelledError):
+                await heartbeat
+            await self.redis.delete(self.key_heartbeat())
+
+    async def _serve(self, max_jobs: int | None) -> None:
+        handled = 0
+        while max_jobs is None or handled < max_jobs:
+            if self.runner.full():
+                if self.runner.tasks:
+                    await asyncio.wait(
+                        self.runner.tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                else:
+                    await asyncio.sleep(0)
+                continue
+            raw = await self.redis.blmove(
+                self.key(), self.key_processing(), self.block, "RIGHT", "LEFT"
+            )  # type: ignore[misc]
+            if raw is None:
+                continue
+            handled += 1
+            await self.handle(raw)
+        await self.runner.join()
+        if self.acks:
+            await asyncio.gather(*self.acks)
+
+    async def handle(self, raw: bytes) -> None:
+        try:
+            job = Job.loads(raw)
+            session, deps = self.make_session(job), self.make_deps(job)
+        except (LookupError, TypeError, ValueError) as e:
+            logger.error(f"Dropping invalid job - {e!r}")
+            await self.redis.lrem(self.key_processing(), 1, raw)  # type: ignore[misc]
+            return
+        try:
+            future = await self.runner.submit(
+                session, self.agent, job.user_prompt, deps
+            )
+        except RedisError as e:
+            # Still in our processing list, the next recover() requeues it
+            logger.error(f"Failed to submit job - {e!r}")
+            return
+        task = asyncio.create_task(self._ack(raw, future))
+        self.acks.add(task)
+        task.add_done_callback(self.acks.discard)
+
+    async def _ack(self, raw: bytes, future: asyncio.Future[None]) -> None:
+        await asyncio.wait([future])
+        await self.redis.lrem(self.key_processing(), 1, raw)  # type: ignore[misc]
+
+
+async def _serve(target: str) -> None:
+    module_name, _, attr = target.partition(":")
+    worker = getattr(importlib.import_module(module_name), attr or "worker")
+    if not isinstance(worker, Worker):
+        worker = worker()
+        if inspect.isawaitable(worker):
+            worker = await worker
+    await worker.serve()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="pydantic-ai-stream-worker",
+        description="Pull run jobs from a Redis queue and execute them",
+    )
+    parser.add_argument(
+        "target",
+        help="module:attribute resolving to a Worker, or a (async) factory returning one",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.target))
+
+
+if __name__ == "__main__":
+    main()
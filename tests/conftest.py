@@ -1,8 +1,9 @@
-import pytest_asyncio
 from dataclasses import dataclass
+
+import pytest_asyncio
 from fakeredis import FakeAsyncRedis
 
-from pydantic_ai_stream import Deps
+from pydantic_ai_stream import Deps, Session
 
 
 @dataclass
@@ -11,6 +12,18 @@ class AppDeps(Deps):
         return 42
 
 
+@dataclass
+class MemorySession(Session):
+    loads: int = 0
+    saves: int = 0
+
+    async def load(self) -> None:
+        self.loads += 1
+
+    async def save(self) -> None:
+        self.saves += 1
+
+
 @pytest_asyncio.fixture
 async def redis():
     client = FakeAsyncRedis()
@@ -0,0 +1,68 @@
+"""Tests for bulk history analytics."""
+
+import pytest
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.usage import RequestUsage
+
+from pydantic_ai_stream.analytics import COLUMNS, extract_records, records_from_json
+
+from .conftest import MemorySession
+
+
+def history(tool: str) -> bytes:
+    return MemorySession(
+        msgs=[
+            ModelRequest(parts=[UserPromptPart(content="q")]),
+            ModelResponse(
+                parts=[ToolCallPart(tool_name=tool, args={}, tool_call_id="c")],
+                usage=RequestUsage(input_tokens=10, output_tokens=2),
+            ),
+            ModelRequest(
+                parts=[ToolReturnPart(tool_name=tool, content="r", tool_call_id="c")]
+            ),
+            ModelResponse(
+                parts=[TextPart(content="a")],
+                usage=RequestUsage(input_tokens=20, output_tokens=5),
+            ),
+        ]
+    ).msgs_to_json()
+
+
+class TestRecords:
+    def test_flattens_parts(self):
+        records = records_from_json(7, history("search"))
+        cols = records.columns
+        assert len(records) == 4
+        assert cols["session"] == [7] * 4
+        assert cols["node"] == [0, 0, 1, 1]
+        assert cols["part_kind"] == ["user-prompt", "tool-call", "tool-return", "text"]
+        assert cols["tool_name"] == [None, "search", "search", None]
+        assert sum(cols["input_tokens"]) == 30
+        assert sum(cols["output_tokens"]) == 7
+
+    @pytest.mark.parametrize("max_workers", [0, 2])
+    def test_extract_many(self, max_workers):
+        histories = [history(f"t{i % 3}") for i in range(10)]
+        records = extract_records(histories, max_workers=max_workers, batch_size=3)
+        assert len(records) == 40
+        assert sorted(set(records.columns["session"])) == list(range(10))
+
+    def test_to_numpy(self):
+        np = pytest.importorskip("numpy")
+        arrays = records_from_json(0, history("s")).to_numpy()
+        assert set(arrays) == set(COLUMNS)
+        assert arrays["output_tokens"].dtype == np.int64
+        assert int(arrays["output_tokens"].sum()) == 7
+
+    def test_to_arrow(self):
+        pytest.importorskip("pyarrow")
+        table = records_from_json(0, history("s")).to_arrow()
+        assert table.num_rows == 4
+        assert table.column_names == list(COLUMNS)
@@ -0,0 +1,90 @@
+"""Tests for stream archival on stop()."""
+
+import pytest
+
+from pydantic_ai_stream.archive import (
+    ArchiveSink,
+    FileSink,
+    drain,
+    read_archive,
+    wait_archived,
+)
+from pydantic_ai_stream.deps import ARCHIVE_BUDGET
+
+from .conftest import AppDeps
+
+
+class MemorySink(ArchiveSink):
+    def __init__(self):
+        self.archives = {}
+
+    async def write(self, key, entries):
+        self.archives[key] = entries
+
+
+class FailingSink(ArchiveSink):
+    async def write(self, key, entries):
+        raise OSError("disk full")
+
+
+class TestDrain:
+    @pytest.mark.asyncio
+    async def test_drains_in_pages(self, make_deps):
+        deps = make_deps()
+        for n in range(7):
+            await deps.add_info({"n": n})
+        entries = await drain(deps.transport, deps.key(), page=3)
+        assert [e[1]["body"]["n"] for e in entries] == list(range(7))
+
+
+class TestArchiveOnStop:
+    @pytest.mark.asyncio
+    async def test_archives_full_stream(self, redis):
+        sink = MemorySink()
+        deps = AppDeps(redis=redis, user_id=1, session_id="arch-1", archive=sink)
+        await deps.start()
+        await deps.add_info({"n": 1})
+        await deps.stop(grace_period=10)
+        await wait_archived()
+        entries = sink.archives[deps.key()]
+        assert [e[1]["type"] for e in entries] == ["begin", "info", "end"]
+        assert 0 < await redis.ttl(deps.key()) <= 10
+
+    @pytest.mark.asyncio
+    async def test_failed_archival_still_expires(self, redis):
+        deps = AppDeps(
+            redis=redis, user_id=1, session_id="arch-2", archive=FailingSink()
+        )
+        await deps.start()
+        await deps.stop(grace_period=10)
+        await wait_archived()
+        assert 0 < await redis.ttl(deps.key()) <= 10
+
+    @pytest.mark.asyncio
+    async def test_stream_has_safety_ttl_while_archiving(self, redis):
+        class ProbingSink(ArchiveSink):
+            async def write(self, key, entries):
+                ttls.append(await redis.ttl(key))
+
+        ttls: list[int] = []
+        deps = AppDeps(
+            redis=redis, user_id=1, session_id="arch-4", archive=ProbingSink()
+        )
+        await deps.start()
+        await deps.stop(grace_period=10)
+        await wait_archived()
+        assert 10 < ttls[0] <= 10 + ARCHIVE_BUDGET
+        assert 0 < await redis.ttl(deps.key()) <= 10
+
+    @pytest.mark.asyncio
+    async def test_file_sink_roundtrip(self, redis, tmp_path):
+        sink = FileSink(directory=tmp_path)
+        deps = AppDeps(redis=redis, user_id=1, session_id="arch-3", archive=sink)
+        await deps.start()
+        await deps.add_info({"msg": "ü"})
+        await deps.stop()
+        await wait_archived()
+        (path,) = tmp_path.rglob("*.jsonl.gz")
+        entries = read_archive(path)
+        assert [e[1]["type"] for e in entries] == ["begin", "info", "end"]
+        assert entries[1][1]["body"] == {"msg": "ü"}
@@ -0,0 +1,180 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelRequest, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from pydantic_ai_stream import (
+    AgxCanceledError,
+    Session,
+    SessionLockLostError,
+    SessionQueue,
+)
+
+from .conftest import AppDeps, MemorySession
+
+
+def gated_agent(prompts: list[str], gate: asyncio.Event) -> Agent:
+    async def reply(msgs: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+        part = msgs[-1].parts[-1]
+        assert isinstance(part, UserPromptPart)
+        prompts.append(part.content)  # type: ignore[arg-type]
+        await gate.wait()
+        yield "ok"
+
+    return Agent(FunctionModel(stream_function=reply))
+
+
+def user_prompts(session: Session) -> list[str]:
+    return [
+        part.content  # type: ignore[misc]
+        for msg in session.msgs
+        if isinstance(msg, ModelRequest)
+        for part in msg.parts
+        if isinstance(part, UserPromptPart)
+    ]
+
+
+async def started(prompts: list[str], n: int) -> None:
+    while len(prompts) < n:
+        await asyncio.sleep(0.001)
+
+
+class TestSessionQueue:
+    @pytest.mark.asyncio
+    async def test_follow_ups_are_serialized(self, redis):
+        prompts: list[str] = []
+        gate = asyncio.Event()
+        agent = gated_agent(prompts, gate)
+        queue = SessionQueue(redis=redis)
+        deps = AppDeps(redis=redis, user_id=1, session_id="batch")
+        holder = MemorySession()
+
+        first = asyncio.create_task(queue.run(holder, agent, "a", deps))
+        await started(prompts, 1)
+        other = MemorySession()
+        assert await queue.run(other, agent, "b", deps) is False
+        gate.set()
+        assert await first is True
+
+        assert prompts == ["a", "b"]
+        assert user_prompts(holder) == ["a", "b"]
+        assert (holder.loads, holder.saves) == (1, 1)
+        assert (other.loads, other.saves) == (0, 0)
+        assert await redis.exists(queue.key_lock(deps)) == 0
+
+    @pytest.mark.asyncio
+    async def test_merge_folds_waiting_prompts_into_one_turn(self, redis):
+        prompts: list[str] = []
+        gate = asyncio.Event()
+        agent = gated_agent(prompts, gate)
+        queue = SessionQueue(redis=redis, merge=True)
+        deps = AppDeps(redis=redis, user_id=1, session_id="merge")
+        holder = MemorySession()
+
+        first = asyncio.create_task(queue.run(holder, agent, "a", deps))
+        await started(prompts, 1)
+        await queue.run(MemorySession(), agent, "b", deps)
+        await queue.run(MemorySession(), agent, "c", deps)
+        gate.set()
+        await first
+
+        assert prompts == ["a", "b\n\nc"]
+        assert holder.saves == 1
+
+    @pytest.mark.asyncio
+    async def test_cancel_drops_waiting_prompts(self, redis):
+        prompts: list[str] = []
+        gate = asyncio.Event()
+        agent = gated_agent(prompts, gate)
+        queue = SessionQueue(redis=redis)
+        deps = AppDeps(redis=redis, user_id=1, session_id="cancel")
+        holder = MemorySession()
+
+        first = asyncio.create_task(queue.run(holder, agent, "a", deps))
+        await started(prompts, 1)
+        await queue.run(MemorySession(), agent, "b", deps)
+        await deps.cancel()
+        gate.set()
+        with pytest.raises(AgxCanceledError):
+            await first
+
+        assert prompts == ["a"]
+        assert holder.saves == 0
+        assert await redis.exists(queue.key_prompts(deps), queue.key_lock(deps)) == 0
+
+    @pytest.mark.asyncio
+    async def test_crash_drops_waiting_prompts(self, redis):
+        running = asyncio.Event()
+        gate = asyncio.Event()
+
+        async def reply(
+            msgs: list[ModelMessage], info: AgentInfo
+        ) -> AsyncIterator[str]:
+            running.set()
+            await gate.wait()
+            raise RuntimeError("boom")
+            yield
+
+        agent = Agent(FunctionModel(stream_function=reply))
+        queue = SessionQueue(redis=redis)
+        deps = AppDeps(redis=redis, user_id=1, session_id="crash")
+
+        first = asyncio.create_task(queue.run(MemorySession(), agent, "a", deps))
+        await running.wait()
+        await queue.run(MemorySession(), agent, "b", deps)
+        gate.set()
+        with pytest.raises(RuntimeError):
+            await first
+        assert await redis.exists(queue.key_prompts(deps), queue.key_lock(deps)) == 0
+
+    @pytest.mark.asyncio
+    async def test_skips_prompt_already_run_by_previous_holder(self, redis):
+        prompts: list[str] = []
+        gate = asyncio.Event()
+        gate.set()
+        queue = SessionQueue(redis=redis)
+        deps = AppDeps(redis=redis, user_id=1, session_id="late")
+        set_lock = redis.set
+
+        async def late_set(*args, **kwargs):
+            # The previous holder pops our prompt just before releasing the lock
+            await redis.delete(queue.key_prompts(deps))
+            return await set_lock(*args, **kwargs)
+
+        redis.set = late_set
+        session = MemorySession()
+        assert await queue.run(session, gated_agent(prompts, gate), "a", deps) is False
+        assert prompts == []
+        assert (session.loads, session.saves) == (0, 0)
+        assert await redis.exists(deps.key(), queue.key_lock(deps)) == 0
+
+    @pytest.mark.asyncio
+    async def test_lost_lock_stops_the_batch(self, redis):
+        prompts: list[str] = []
+        gate = asyncio.Event()
+        agent = gated_agent(prompts, gate)
+        queue = SessionQueue(redis=redis, lock_ttl=3)
+        deps = AppDeps(redis=redis, user_id=1, session_id="lost")
+        holder = MemorySession()
+
+        first = asyncio.create_task(queue.run(holder, agent, "a", deps))
+        await started(prompts, 1)
+        await queue.run(MemorySession(), agent, "b", deps)
+        await redis.set(queue.key_lock(deps), "other")
+        with pytest.raises(SessionLockLostError):
+            await first
+
+        assert holder.saves == 0
+        assert await redis.lrange(queue.key_prompts(deps), 0, -1) == [b"b"]
+        assert await redis.get(queue.key_lock(deps)) == b"other"
+
+    @pytest.mark.asyncio
+    async def test_lock_is_only_released_by_owner(self, redis):
+        queue = SessionQueue(redis=redis)
+        await redis.set("lock", "theirs")
+        assert await queue._if_owner("lock", "mine", "delete") is False
+        assert await redis.get("lock") == b"theirs"
+        assert await queue._if_owner("lock", "theirs", "delete") is True
@@ -0,0 +1,95 @@
+"""Tests for the sync bridge, called from plain threads."""
+
+import asyncio
+import threading
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from pydantic_ai_stream import MemoryTransport, SyncDeps, get_bridge
+from pydantic_ai_stream.bridge import Bridge
+
+from .conftest import AppDeps
+
+
+@pytest.fixture
+def bridge():
+    bridge = Bridge()
+    yield bridge
+    bridge.close()
+
+
+def make(bridge: Bridge, session_id: str = "sync", **kwargs) -> SyncDeps:
+    kwargs.setdefault("transport", MemoryTransport())
+    deps = AppDeps(user_id=1, session_id=session_id, **kwargs)
+    return SyncDeps(deps=deps, bridge=bridge)
+
+
+class TestBridge:
+    def test_shared_bridge(self):
+        assert get_bridge() is get_bridge()
+        assert get_bridge().thread.daemon
+
+    def test_calls_run_on_one_loop(self, bridge):
+        async def loop_id():
+            return id(asyncio.get_running_loop())
+
+        assert {bridge.call(loop_id()) for _ in range(3)} == {id(bridge.loop)}
+
+    def test_errors_propagate(self, bridge):
+        async def boom():
+            raise KeyError("x")
+
+        with pytest.raises(KeyError):
+            bridge.call(boom())
+
+
+class TestSyncDeps:
+    def test_lifecycle_and_listen(self, bridge):
+        deps = make(bridge)
+        deps.start()
+        assert deps.is_live() is True
+        deps.add(type="event", origin="pydantic-ai", body={"n": 1})
+        deps.add_info({"msg": "hi"})
+        deps.stop()
+        events = list(deps.listen(serialize=False))
+        assert [e["type"] for e in events] == ["begin", "event", "info"]
+        assert deps.is_live() is False
+
+    def test_listen_from_another_thread(self, bridge):
+        deps = make(bridge)
+        deps.start()
+        received: list[str] = []
+
+        def consume():
+            for event in deps.listen(serialize=False):
+                received.append(event["type"])
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        for n in range(3):
+            deps.add(type="event", origin="pydantic-ai", body={"n": n})
+        deps.stop()
+        consumer.join(5)
+        assert received == ["begin", "event", "event", "event"]
+
+    def test_early_break_closes_generator(self, bridge):
+        deps = make(bridge)
+        deps.start()
+        deps.add(type="event", origin="pydantic-ai", body={"n": 1})
+        for _ in deps.listen(serialize=False):
+            break
+        assert deps.cancel() is True
+        assert deps.cancel() is False
+
+    def test_redis_client_shared_on_bridge_loop(self, bridge):
+        redis = FakeAsyncRedis()
+        a = make(bridge, "a", redis=redis, transport=None)
+        b = make(bridge, "b", redis=redis, transport=None)
+        a.start()
+        b.start()
+        a.add_error({"msg": "boom"})
+        assert a.is_live() and b.is_live()
+        a.stop()
+        assert [e["type"] for e in a.listen(serialize=False)] == ["begin", "error"]
+        bridge.call(redis.aclose())
@@ -0,0 +1,104 @@
+"""Tests for the in-process TailCache used by Deps.listen()."""
+
+import pytest
+
+from pydantic_ai_stream.cache import TailCache
+
+
+def ev(n: int) -> dict:
+    return {"type": "event", "origin": "test", "body": {"n": n}}
+
+
+class TestTailCache:
+    def test_extend_from_start(self):
+        cache = TailCache()
+        cache.extend("k", "0", [("1-0", ev(1)), ("2-0", ev(2))])
+        assert cache.snapshot("k") == ("0", [("1-0", ev(1)), ("2-0", ev(2))])
+
+    def test_extend_skips_known_entries(self):
+        cache = TailCache()
+        cache.extend("k", "0", [("1-0", ev(1)), ("2-0", ev(2))])
+        cache.extend("k", "1-0", [("2-0", ev(2)), ("3-0", ev(3))])
+        _, entries = cache.snapshot("k")
+        assert [e[0] for e in entries] == ["1-0", "2-0", "3-0"]
+
+    def test_gap_restarts_tail(self):
+        cache = TailCache()
+        cache.extend("k", "0", [("1-0", ev(1))])
+        cache.extend("k", "5-0", [("6-0", ev(6))])
+        assert cache.snapshot("k") == ("5-0", [("6-0", ev(6))])
+
+    def test_ring_buffer_moves_base(self):
+        cache = TailCache(max_entries=2)
+        cache.extend("k", "0", [(f"{i}-0", ev(i)) for i in range(1, 4)])
+        base, entries = cache.snapshot("k")
+        assert base == "1-0"
+        assert [e[0] for e in entries] == ["2-0", "3-0"]
+
+    def test_lru_eviction(self):
+        cache = TailCache(max_keys=2)
+        cache.extend("a", "0", [("1-0", ev(1))])
+        cache.extend("b", "0", [("1-0", ev(1))])
+        cache.get("a")
+        cache.extend("c", "0", [("1-0", ev(1))])
+        assert set(cache.tails) == {"a", "c"}
+
+    def test_ttl_eviction(self):
+        cache = TailCache(ttl=0)
+        cache.extend("k", "0", [("1-0", ev(1))])
+        cache.tails["k"].touched -= 1
+        assert cache.snapshot("k") == ("0", [])
+
+
+class TestListenWithCache:
+    @pytest.fixture
+    def xread_calls(self, redis, monkeypatch):
+        calls = []
+        xread = redis.xread
+
+        async def spy(streams, **kwargs):
+            calls.append(dict(streams))
+            return await xread(streams, **kwargs)
+
+        monkeypatch.setattr(redis, "xread", spy)
+        return calls
+
+    async def _fill(self, deps):
+        await deps.start()
+        for i in range(3):
+            await deps.add(type="event", origin="test", body={"n": i})
+        await deps.stop()
+
+    @pytest.mark.asyncio
+    async def test_second_listener_served_from_memory(self, make_deps, xread_calls):
+        deps = make_deps()
+        await self._fill(deps)
+        cache = TailCache()
+        first = [e async for e in deps.listen(serialize=False, cache=cache)]
+        assert [c[deps.key()] for c in xread_calls] == ["0"]
+        xread_calls.clear()
+        second = [e async for e in deps.listen(serialize=False, cache=cache)]
+        assert second == first
+        assert len(first) == 4
+        assert xread_calls == []
+
+    @pytest.mark.asyncio
+    async def test_truncated_tail_reads_head_from_redis(self, make_deps):
+        deps = make_deps()
+        await self._fill(deps)
+        cache = TailCache(max_entries=2)
+        first = [e async for e in deps.listen(serialize=False, cache=cache)]
+        second = [e async for e in deps.listen(serialize=False, cache=cache)]
+        assert second == first
+
+    @pytest.mark.asyncio
+    async def test_stale_tail_is_dropped(self, redis, make_deps):
+        deps = make_deps()
+        await self._fill(deps)
+        cache = TailCache()
+        _ = [e async for e in deps.listen(serialize=False, cache=cache)]
+        await redis.delete(deps.key())
+        await deps.start()
+        await deps.stop()
+        events = [e async for e in deps.listen(serialize=False, cache=cache)]
+        assert [e["type"] for e in events] == ["begin"]
@@ -0,0 +1,96 @@
+from collections.abc import AsyncIterator
+
+import pytest
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from pydantic_ai_stream import Checkpoints, resume, run
+from pydantic_ai_stream.checkpoint import _dump_runtime, _load_runtime
+from pydantic_ai_stream.deps import Node, Runtime, ToolStats
+
+from .conftest import AppDeps, MemorySession
+
+
+def flaky_agent(tool_calls: list[str], fail: list[bool]) -> Agent:
+    async def reply(
+        msgs: list[ModelMessage], info: AgentInfo
+    ) -> AsyncIterator[str | dict[int, DeltaToolCall]]:
+        last = msgs[-1].parts[-1]
+        if not isinstance(last, ToolReturnPart):
+            yield {0: DeltaToolCall(name="expensive", json_args='{"q": "x"}')}
+            return
+        if fail and fail.pop():
+            raise RuntimeError("worker died")
+        yield f"answer: {last.content}"
+
+    agent = Agent(FunctionModel(stream_function=reply), deps_type=AppDeps)
+
+    @agent.tool
+    async def expensive(ctx: RunContext[AppDeps], q: str) -> str:
+        tool_calls.append(q)
+        return "computed"
+
+    return agent
+
+
+class TestCheckpoints:
+    @pytest.mark.asyncio
+    async def test_resume_skips_finished_tool_calls(self, redis):
+        tool_calls: list[str] = []
+        agent = flaky_agent(tool_calls, fail=[True])
+        checkpoints = Checkpoints(redis=redis)
+        deps = AppDeps(redis=redis, user_id=1, session_id="ckpt")
+        session = MemorySession()
+
+        with pytest.raises(RuntimeError, match="worker died"):
+            await run(session, agent, "go", deps, checkpoints=checkpoints)
+        assert session.saves == 0
+        checkpoint = await checkpoints.load(deps)
+        assert checkpoint is not None
+        assert isinstance(checkpoint.msgs[-1], ModelRequest)
+        assert isinstance(checkpoint.msgs[-1].parts[0], ToolReturnPart)
+
+        restarted = AppDeps(redis=redis, user_id=1, session_id="ckpt")
+        assert await resume(session, agent, restarted, checkpoints) is True
+        assert tool_calls == ["x"]
+        assert [type(m) for m in session.msgs] == [
+            ModelRequest,
+            ModelResponse,
+            ModelRequest,
+            ModelResponse,
+        ]
+        assert session.msgs[-1].parts[0].content == "answer: computed"  # type: ignore[union-attr]
+        assert restarted.runtime.tool_stats["expensive"].calls == 1
+        assert len(restarted.runtime.nodes) == 2
+        assert await checkpoints.load(deps) is None
+
+    @pytest.mark.asyncio
+    async def test_cleared_after_successful_run(self, redis):
+        checkpoints = Checkpoints(redis=redis)
+        deps = AppDeps(redis=redis, user_id=1, session_id="ok")
+        await run(
+            MemorySession(), flaky_agent([], []), "go", deps, checkpoints=checkpoints
+        )
+        assert await redis.exists(checkpoints.key(deps)) == 0
+
+    @pytest.mark.asyncio
+    async def test_resume_without_checkpoint(self, redis):
+        deps = AppDeps(redis=redis, user_id=1, session_id="none")
+        session = MemorySession()
+        assert await resume(session, None, deps, Checkpoints(redis=redis)) is False
+        assert session.saves == 0
+
+    def test_runtime_roundtrip(self):
+        runtime = Runtime(
+            nodes=[Node(idx=0, stopped=True), Node(idx=1, stopped=True)],
+            tool_stats={"t": ToolStats(calls=2, total_ms=3, max_ms=2)},
+        )
+        restored = _load_runtime(_dump_runtime(runtime))
+        assert restored.nodes == runtime.nodes
+        assert restored.tool_stats == runtime.tool_stats
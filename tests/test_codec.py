@@ -0,0 +1,108 @@
+"""Tests for stream entry encoding."""
+
+import json
+
+import pytest
+
+from pydantic_ai_stream import codec, settings
+
+DELTA = {
+    "idx": 3,
+    "event": "part_delta",
+    "event_idx": 0,
+    "part_delta_kind": "text",
+    "content_delta": "Hel",
+}
+
+
+def as_entry(fields: dict) -> dict[bytes, bytes]:
+    return {
+        k.encode(): v if isinstance(v, bytes) else str(v).encode()
+        for k, v in fields.items()
+    }
+
+
+@pytest.fixture
+def msgpack_codec():
+    pytest.importorskip("msgpack")
+    settings.set_stream_codec("msgpack")
+    yield
+    settings.set_stream_codec("json")
+
+
+class TestJson:
+    def test_roundtrip(self):
+        entry = as_entry(codec.encode("event", "pydantic-ai", DELTA))
+        assert codec.decode(entry) == {
+            "type": "event",
+            "origin": "pydantic-ai",
+            "body": DELTA,
+        }
+
+    def test_missing_body(self):
+        entry = as_entry(codec.encode("end", "pydantic-ai-stream", None))
+        assert codec.decode(entry)["body"] == {}
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError, match="codec"):
+            codec.encode("end", "x", None, "yaml")
+
+
+class TestMsgpack:
+    @pytest.fixture(autouse=True)
+    def _msgpack(self):
+        pytest.importorskip("msgpack")
+
+    def test_roundtrip(self):
+        entry = as_entry(codec.encode("event", "pydantic-ai", DELTA, "msgpack"))
+        assert codec.decode(entry) == {
+            "type": "event",
+            "origin": "pydantic-ai",
+            "body": DELTA,
+        }
+
+    def test_unknown_values_are_kept_verbatim(self):
+        body = {"event": "tool-progress", "custom": [1, {"a": None}]}
+        entry = as_entry(codec.encode("progress", "myapp", body, "msgpack"))
+        assert codec.decode(entry) == {
+            "type": "progress",
+            "origin": "myapp",
+            "body": body,
+        }
+
+    def test_at_least_halves_delta_size(self):
+        def size(fields):
+            return sum(
+                len(k) + len(as_entry({k: v})[k.encode()]) for k, v in fields.items()
+            )
+
+        compact = size(codec.encode("event", "pydantic-ai", DELTA, "msgpack"))
+        verbose = size(codec.encode("event", "pydantic-ai", DELTA))
+        assert compact * 2 <= verbose
+
+    def test_rejects_unknown_version(self):
+        entry = as_entry(codec.encode("end", "x", None, "msgpack"))
+        entry[b"v"] = b"99"
+        with pytest.raises(ValueError, match="version"):
+            codec.decode(entry)
+
+
+class TestListen:
+    @pytest.mark.asyncio
+    async def test_writes_compact_entries(self, redis, make_deps, msgpack_codec):
+        deps = make_deps()
+        await deps.add_info({"msg": "hi"})
+        _, fields = (await redis.xrange(deps.key()))[0]
+        assert set(fields) == {b"v", b"m"}
+
+    @pytest.mark.asyncio
+    async def test_reads_mixed_streams(self, redis, make_deps, msgpack_codec):
+        deps = make_deps()
+        await redis.xadd(
+            deps.key(),
+            {"type": "info", "origin": "old", "body": json.dumps({"n": 1})},
+        )
+        await deps.add_info({"n": 2})
+        await deps.stop()
+        events = [e async for e in deps.listen(serialize=False, wait=1, timeout=1)]
+        assert [e["body"] for e in events] == [{"n": 1}, {"n": 2}]
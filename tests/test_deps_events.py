@@ -7,6 +7,8 @@ import pytest
 
 from pydantic_ai.messages import (
     FinalResultEvent,
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
     ModelRequest,
     PartDeltaEvent,
     PartStartEvent,
@@ -20,6 +22,7 @@ from pydantic_ai.messages import (
     UserPromptPart,
 )
 
+from pydantic_ai_stream import settings
 from pydantic_ai_stream.deps import Node, Runtime
 
 
@@ -245,3 +248,134 @@ class TestAddNodeEventFinalResult:
         _, fields = entries[-1]
         body = json.loads(fields[b"body"])
         assert body["event"] == "answer"
+
+
+class TestAddToolEvent:
+    @pytest.mark.asyncio
+    async def test_tool_start_and_end(self, redis, make_deps):
+        deps = make_deps()
+        call = ToolCallPart(tool_name="search", args={"q": "x"}, tool_call_id="c1")
+        await deps.add_tool_event(FunctionToolCallEvent(part=call))
+        result = ToolReturnPart(tool_name="search", content="ok", tool_call_id="c1")
+        await deps.add_tool_event(FunctionToolResultEvent(part=result))
+        entries = await redis.xrange(deps.key())
+        bodies = [json.loads(e[1][b"body"]) for e in entries]
+        assert [b["event"] for b in bodies] == ["tool-start", "tool-end"]
+        assert bodies[0]["tool_name"] == "search"
+        assert bodies[1]["tool_call_id"] == "c1"
+        assert bodies[1]["part_kind"] == "tool-return"
+        assert bodies[1]["duration_ms"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_tracks_per_tool_latency(self, make_deps):
+        deps = make_deps()
+        for i in range(2):
+            call = ToolCallPart(tool_name="search", args={}, tool_call_id=f"c{i}")
+            await deps.add_tool_event(FunctionToolCallEvent(part=call))
+            result = ToolReturnPart(
+                tool_name="search", content="ok", tool_call_id=f"c{i}"
+            )
+            await deps.add_tool_event(FunctionToolResultEvent(part=result))
+        stats = deps.runtime.tool_stats["search"]
+        assert stats.calls == 2
+        assert stats.max_ms >= stats.mean_ms >= 0
+        assert deps.runtime.tool_calls == {}
+
+    @pytest.mark.asyncio
+    async def test_tool_progress(self, redis, make_deps):
+        deps = make_deps()
+        call = ToolCallPart(tool_name="crawl", args={}, tool_call_id="c1")
+        await deps.add_tool_event(FunctionToolCallEvent(part=call))
+        await deps.add_tool_progress("c1", {"done": 3, "total": 10})
+        _, fields = (await redis.xrange(deps.key()))[-1]
+        body = json.loads(fields[b"body"])
+        assert body["event"] == "tool-progress"
+        assert body["tool_name"] == "crawl"
+        assert body["done"] == 3
+
+
+class TestToolReturnChunking:
+    @pytest.fixture(autouse=True)
+    def small_chunks(self):
+        original = settings.tool_return_chunk_size
+        settings.set_tool_return_chunk_size(4)
+        yield
+        settings.set_tool_return_chunk_size(original)
+
+    def node(self, content):
+        node = MagicMock()
+        node.request = ModelRequest(
+            parts=[ToolReturnPart(tool_name="t", tool_call_id="c1", content=content)]
+        )
+        return node
+
+    @pytest.mark.asyncio
+    async def test_small_content_is_inline(self, redis, make_deps):
+        deps = make_deps()
+        await deps.add_node_begin(self.node("abc"))
+        _, fields = (await redis.xrange(deps.key()))[-1]
+        body = json.loads(fields[b"body"])
+        assert body["content"] == "abc"
+        assert "chunks" not in body
+
+    @pytest.mark.asyncio
+    async def test_large_content_is_chunked(self, redis, make_deps):
+        deps = make_deps()
+        await deps.add_node_begin(self.node("abcdefghij"))
+        entries = await redis.xrange(deps.key())
+        bodies = [json.loads(e[1][b"body"]) for e in entries[1:]]
+        assert bodies[0]["event"] == "part_start"
+        assert bodies[0]["chunks"] == 3
+        assert [b["content_delta"] for b in bodies[1:]] == ["abcd", "efgh", "ij"]
+        assert [b["chunk_idx"] for b in bodies[1:]] == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_budget_is_in_bytes(self, redis, make_deps):
+        deps = make_deps()
+        await deps.add_node_begin(self.node("héé€x"))
+        entries = await redis.xrange(deps.key())
+        bodies = [json.loads(e[1][b"body"]) for e in entries[1:]]
+        chunks = [b["content_delta"] for b in bodies[1:]]
+        assert "".join(chunks) == "héé€x"
+        assert all(len(chunk.encode()) <= 4 for chunk in chunks)
+        assert bodies[0]["chunks"] == len(chunks) == 3
+
+    @pytest.mark.asyncio
+    async def test_inline_json_content_is_encoded_once(
+        self, redis, make_deps, monkeypatch
+    ):
+        settings.set_tool_return_chunk_size(1024)
+        content = {"rows": [1, 2, 3]}
+        dumped = []
+        dumps = json.dumps
+
+        def counting(obj, *args, **kwargs):
+            dumped.append(obj is content or obj.get("content") is content)
+            return dumps(obj, *args, **kwargs)
+
+        monkeypatch.setattr(json, "dumps", counting)
+        deps = make_deps()
+        await deps.add_node_begin(self.node(content))
+        monkeypatch.setattr(json, "dumps", dumps)
+        _, fields = (await redis.xrange(deps.key()))[-1]
+        body = json.loads(fields[b"body"])
+        assert body["content"] == content
+        assert "chunks" not in body
+        assert dumped.count(True) == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content", ["abcdefghij", {"rows": [1, 2, 3]}])
+    async def test_listen_reassembles(self, make_deps, content):
+        deps = make_deps()
+        await deps.add_node_begin(self.node(content))
+        await deps.stop()
+        events = [
+            e
+            async for e in deps.listen(
+                serialize=False, wait=1, timeout=1, reassemble=True
+            )
+        ]
+        assert [e["body"]["event"] for e in events] == ["llm-begin", "part_start"]
+        body = events[1]["body"]
+        assert body["content"] == content
+        assert "chunks" not in body and "content_encoding" not in body
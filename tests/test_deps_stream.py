@@ -173,6 +173,50 @@ class TestListen:
         assert events[0]["body"] == {}
 
 
+class TestControlLane:
+    @pytest.mark.asyncio
+    async def test_control_events_are_mirrored(self, redis, make_deps):
+        deps = make_deps()
+        deps.control_lane = True
+        await deps.start()
+        await deps.add(type="event", origin="pydantic-ai", body={"n": 0})
+        await deps.add_error({"msg": "canceled"})
+        await deps.add_info({"msg": "hi"})
+        lane = [f[b"type"] for _, f in await redis.xrange(deps.key_control())]
+        main = [f[b"type"] for _, f in await redis.xrange(deps.key())]
+        assert lane == [b"error", b"info"]
+        assert main == [b"begin", b"event", b"error", b"info"]
+        await deps.stop(grace_period=10)
+        assert 0 < await redis.ttl(deps.key_control()) <= 10
+
+    @pytest.mark.asyncio
+    async def test_listen_delivers_control_ahead_of_backlog(self, make_deps):
+        deps = make_deps()
+        deps.control_lane = True
+        await deps.start()
+        for n in range(1000):
+            await deps.add(type="event", origin="pydantic-ai", body={"n": n})
+        await deps.add_error({"msg": "canceled"})
+        await deps.stop()
+        events = [e async for e in deps.listen(serialize=False)]
+        types = [e["type"] for e in events]
+        assert types.count("error") == 1
+        assert types.index("error") < 300
+        assert [e["body"]["n"] for e in events if e["type"] == "event"] == list(
+            range(1000)
+        )
+
+    @pytest.mark.asyncio
+    async def test_listen_without_lane_keeps_order(self, make_deps):
+        deps = make_deps()
+        await deps.start()
+        await deps.add(type="event", origin="pydantic-ai", body={"n": 0})
+        await deps.add_error({"msg": "boom"})
+        await deps.stop()
+        types = [e["type"] async for e in deps.listen(serialize=False)]
+        assert types == ["begin", "event", "error"]
+
+
 class TestQuery:
     @pytest.mark.asyncio
     async def test_q_yields_active_sessions(self, redis, make_deps):
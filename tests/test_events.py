@@ -0,0 +1,148 @@
+import pytest
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_stream import codec, run, settings
+from pydantic_ai_stream.events import (
+    SCHEMA_VERSION,
+    Begin,
+    Error,
+    LlmBegin,
+    LlmEnd,
+    PartDelta,
+    PartStart,
+    ToolEnd,
+    ToolProgress,
+    ToolStart,
+    Unknown,
+    decode,
+    from_event,
+)
+
+from .conftest import AppDeps, MemorySession
+
+
+async def streamed(redis, session_id: str = "typed") -> AppDeps:
+    agent = Agent(TestModel(), deps_type=AppDeps)
+
+    @agent.tool
+    async def lookup(ctx: RunContext[AppDeps], q: str) -> str:
+        await ctx.deps.add_tool_progress(ctx.tool_call_id, {"step": 1})
+        return "found"
+
+    deps = AppDeps(redis=redis, user_id=1, session_id=session_id)
+    await run(MemorySession(), agent, "hello", deps)
+    return deps
+
+
+class TestTypedEvents:
+    @pytest.mark.asyncio
+    async def test_listen_typed(self, redis):
+        deps = await streamed(redis)
+        events = [e async for e in deps.listen(typed=True)]
+        kinds = {type(e) for e in events}
+        assert {Begin, LlmBegin, LlmEnd, PartStart, ToolStart, ToolEnd} <= kinds
+        assert isinstance(events[0], Begin)
+        assert events[0].session_id == "typed"
+        progress = next(e for e in events if isinstance(e, ToolProgress))
+        assert progress.tool_name == "lookup"
+        assert progress.extra == {"step": 1}
+        call = next(
+            e for e in events if isinstance(e, PartStart) and e.part_kind == "tool-call"
+        )
+        assert call.tool_name == "lookup" and isinstance(call.args, dict)
+
+    @pytest.mark.asyncio
+    async def test_decode_raw_entries_in_both_codecs(self, redis):
+        pytest.importorskip("msgpack")
+        plain = await streamed(redis, "plain")
+        settings.set_stream_codec("msgpack")
+        try:
+            packed = await streamed(redis, "packed")
+        finally:
+            settings.set_stream_codec("json")
+        for deps in (plain, packed):
+            for _, fields in await redis.xrange(deps.key()):
+                assert decode(fields) == from_event(codec.decode(fields))
+        decoded = [decode(f) for _, f in await redis.xrange(packed.key())]
+        assert not any(isinstance(e, Unknown) for e in decoded)
+
+    @pytest.mark.asyncio
+    async def test_decode_skips_the_dict_path(self, redis, monkeypatch):
+        pytest.importorskip("msgpack")
+        settings.set_stream_codec("msgpack")
+        try:
+            deps = await streamed(redis, "direct")
+        finally:
+            settings.set_stream_codec("json")
+        entries = [f for _, f in await redis.xrange(deps.key())]
+        expected = [from_event(codec.decode(f)) for f in entries]
+
+        def no_dict(entry):
+            raise AssertionError("decode went through codec.decode")
+
+        monkeypatch.setattr(codec, "decode", no_dict)
+        assert [decode(f) for f in entries] == expected
+
+    def test_compact_objects(self):
+        event = from_event(
+            {
+                "type": "event",
+                "origin": "pydantic-ai",
+                "body": {
+                    "idx": 0,
+                    "event": "part_delta",
+                    "event_idx": 1,
+                    "part_delta_kind": "text",
+                    "content_delta": "hi",
+                },
+            }
+        )
+        assert isinstance(event, PartDelta)
+        assert not hasattr(event, "__dict__")
+        assert event.schema_version == SCHEMA_VERSION
+
+    def test_control_events_keep_body(self):
+        event = from_event(
+            {"type": "error", "origin": "developer", "body": {"msg": "x"}}
+        )
+        assert event == Error(origin="developer", body={"msg": "x"})
+
+    def test_unknown_entries_pass_through(self):
+        event = from_event(
+            {"type": "event", "origin": "future", "body": {"idx": 0, "event": "new"}}
+        )
+        assert isinstance(event, Unknown)
+        assert event.body["event"] == "new"
+
+    def test_field_types_are_checked(self):
+        body = {"idx": 0, "event": "tool-end", "tool_name": None, "tool_call_id": "c"}
+        with pytest.raises(ValueError, match="tool_name is NoneType"):
+            from_event({"type": "event", "origin": "x", "body": body})
+        with pytest.raises(ValueError, match="idx is str"):
+            from_event(
+                {
+                    "type": "event",
+                    "origin": "x",
+                    "body": {"idx": "0", "event": "answer"},
+                }
+            )
+
+    def test_whole_floats_are_coerced(self):
+        body = {
+            "idx": 0,
+            "event": "tool-end",
+            "tool_name": "t",
+            "tool_call_id": "c",
+            "duration_ms": 3,
+        }
+        fields = codec.encode("event", "pydantic-ai", body)
+        event = decode({k.encode(): v.encode() for k, v in fields.items()})
+        assert isinstance(event, ToolEnd)
+        assert event.duration_ms == 3.0 and isinstance(event.duration_ms, float)
+
+    def test_malformed_entry(self):
+        with pytest.raises(ValueError, match="Malformed"):
+            from_event(
+                {"type": "event", "origin": "x", "body": {"event": "tool-start"}}
+            )
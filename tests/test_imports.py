@@ -0,0 +1,56 @@
+"""Import-time checks: the listener side must not load pydantic-ai."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+import pydantic_ai_stream
+
+LISTENER = "from pydantic_ai_stream import Deps, LiveCache, TailCache, listen_many, q"
+PRODUCER = "from pydantic_ai_stream import Runner, Session, run"
+
+
+def probe(statement: str) -> dict:
+    code = f"""
+import json, sys, time
+t = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - t
+mods = [m for m in sys.modules if m == "pydantic_ai" or m.startswith("pydantic_ai.")]
+print(json.dumps({{"elapsed": elapsed, "pydantic_ai": bool(mods)}}))
+"""
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout)
+
+
+class TestLazyImports:
+    def test_listener_side_skips_pydantic_ai(self):
+        assert probe(LISTENER)["pydantic_ai"] is False
+
+    def test_producer_side_loads_on_first_use(self):
+        assert probe(PRODUCER)["pydantic_ai"] is True
+
+    def test_lazy_names_resolve(self):
+        from pydantic_ai_stream.engine import run
+        from pydantic_ai_stream.session import Session
+
+        assert pydantic_ai_stream.run is run
+        assert pydantic_ai_stream.Session is Session
+        assert set(pydantic_ai_stream.__all__) <= set(dir(pydantic_ai_stream))
+
+    def test_unknown_name(self):
+        with pytest.raises(AttributeError, match="nope"):
+            pydantic_ai_stream.nope  # noqa: B018
+
+    @pytest.mark.benchmark
+    def test_import_time_benchmark(self):
+        listener = min(probe(LISTENER)["elapsed"] for _ in range(3))
+        producer = min(probe(PRODUCER)["elapsed"] for _ in range(3))
+        print(
+            f"\nimport: listener {listener * 1000:.0f}ms, producer {producer * 1000:.0f}ms"
+        )
+        assert listener < producer
@@ -0,0 +1,83 @@
+"""Tests for listen_many: one listener over several session streams."""
+
+import asyncio
+
+import pytest
+
+from pydantic_ai_stream import listen_many
+
+
+class TestListenManyKeys:
+    @pytest.mark.asyncio
+    async def test_merges_and_tags_sessions(self, redis, make_deps):
+        a, b = make_deps(), make_deps()
+        for deps in (a, b):
+            await deps.start()
+            await deps.add_info({"from": deps.session_id})
+            await deps.stop()
+        events = [
+            e
+            async for e in listen_many(
+                redis, keys=[a.key(), b.key()], serialize=False, timeout=1
+            )
+        ]
+        assert len(events) == 6
+        for deps in (a, b):
+            mine = [e for e in events if e["session_id"] == deps.session_id]
+            assert [e["type"] for e in mine] == ["begin", "info", "end"]
+            assert mine[1]["body"] == {"from": deps.session_id}
+
+    @pytest.mark.asyncio
+    async def test_returns_once_all_sessions_ended(self, redis, make_deps):
+        deps = make_deps()
+        await deps.start()
+        await deps.stop()
+        events = [e async for e in listen_many(redis, keys=[deps.key()], timeout=60)]
+        assert len(events) == 2
+
+    @pytest.mark.asyncio
+    async def test_single_xread_per_round(self, redis, make_deps, monkeypatch):
+        calls = []
+        xread = redis.xread
+
+        async def spy(streams, **kwargs):
+            calls.append(set(streams))
+            return await xread(streams, **kwargs)
+
+        monkeypatch.setattr(redis, "xread", spy)
+        a, b = make_deps(), make_deps()
+        for deps in (a, b):
+            await deps.start()
+        await a.stop()
+        await b.stop()
+        _ = [e async for e in listen_many(redis, keys=[a.key(), b.key()], timeout=1)]
+        assert calls[0] == {a.key(), b.key()}
+
+
+class TestListenManyFollow:
+    @pytest.mark.asyncio
+    async def test_follows_user_sessions(self, redis, make_deps):
+        a = make_deps(user_id=5)
+        other = make_deps(user_id=6)
+        await a.start()
+        await other.start()
+        seen = []
+
+        async def consume():
+            async for event in listen_many(
+                redis, scope_id=42, user_id=5, refresh=0, timeout=1, serialize=False
+            ):
+                seen.append((event["session_id"], event["type"]))
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        b = make_deps(user_id=5)
+        await b.start()
+        await a.stop()
+        await asyncio.sleep(0.05)
+        await b.stop()
+        await task
+        assert (a.session_id, "end") in seen
+        assert (b.session_id, "begin") in seen
+        assert (b.session_id, "end") in seen
+        assert all(s != other.session_id for s, _ in seen)
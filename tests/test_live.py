@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from pydantic_ai_stream import LiveCache, RedisTransport, q
+
+from .conftest import AppDeps
+
+
+async def settle(cache: LiveCache, key: str, live: bool) -> None:
+    for _ in range(100):
+        if (key in cache.flags) is live:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{key} never became {'live' if live else 'idle'}")
+
+
+class TestLiveCache:
+    @pytest.mark.asyncio
+    async def test_snapshot_on_start(self, redis, make_deps):
+        deps = make_deps()
+        await deps.start()
+        async with LiveCache(transport=RedisTransport(redis=redis)) as cache:
+            assert cache.flags == {deps.key_live()}
+
+    @pytest.mark.asyncio
+    async def test_follows_other_writers(self, redis, make_deps):
+        deps = make_deps()
+        async with LiveCache(transport=RedisTransport(redis=redis)) as cache:
+            await deps.start()
+            await settle(cache, deps.key_live(), True)
+            await deps.stop()
+            await settle(cache, deps.key_live(), False)
+            await deps.start()
+            await settle(cache, deps.key_live(), True)
+            await deps.cancel()
+            await settle(cache, deps.key_live(), False)
+
+    @pytest.mark.asyncio
+    async def test_answers_from_memory(self, redis, make_deps):
+        writer = make_deps()
+        await writer.start()
+        async with LiveCache(transport=RedisTransport(redis=redis)) as cache:
+            deps = AppDeps(transport=cache, user_id=1, session_id=writer.session_id)
+
+            async def unexpected(*args, **kwargs):
+                raise AssertionError("went to redis")
+
+            redis.get = unexpected
+            redis.scan_iter = unexpected
+            assert await deps.is_live() is True
+            assert [s async for s in q(cache, 42, 1)] == [(42, 1, writer.session_id)]
+            assert [s async for s in q(cache, 42, 2)] == []
+
+    @pytest.mark.asyncio
+    async def test_own_writes_visible_immediately(self, redis):
+        async with LiveCache(transport=RedisTransport(redis=redis)) as cache:
+            deps = AppDeps(transport=cache, user_id=1, session_id="own")
+            await deps.start()
+            assert await deps.is_live() is True
+            assert await deps.cancel() is True
+            assert await deps.is_live() is False
+
+    @pytest.mark.asyncio
+    async def test_falls_back_until_synced(self, redis, make_deps):
+        deps = make_deps()
+        await deps.start()
+        cache = LiveCache(transport=RedisTransport(redis=redis))
+        assert await cache.has_flag(deps.key_live()) is True
+        assert [k async for k in cache.scan("*:live")] == [deps.key_live()]
+
+    @pytest.mark.asyncio
+    async def test_expired_flags_drop_out(self, redis, make_deps):
+        own, other, idle = make_deps(), make_deps(), make_deps()
+        await other.start()
+        await other.expire_live(1)
+        async with LiveCache(transport=RedisTransport(redis=redis)) as cache:
+            deps = AppDeps(transport=cache, user_id=1, session_id=own.session_id)
+            await deps.start()
+            await deps.expire_live(1)
+            await idle.start()
+            await idle.expire_live(1)
+            await settle(cache, idle.key_live(), True)
+            assert cache.expiring == {k.key_live() for k in (own, other, idle)}
+            await asyncio.sleep(1.5)
+            assert await deps.is_live() is False
+            assert [s async for s in q(cache, 42, 1)] == []
+            assert cache.flags == set()
+
+    @pytest.mark.asyncio
+    async def test_restart_clears_expiry(self, redis, make_deps):
+        deps = make_deps()
+        async with LiveCache(transport=RedisTransport(redis=redis)) as cache:
+            await deps.start()
+            await deps.expire_live(1)
+            await settle(cache, deps.key_live(), True)
+            await deps.start()
+            for _ in range(100):
+                if deps.key_live() not in cache.expiring:
+                    break
+                await asyncio.sleep(0.01)
+            assert cache.expiring == set()
+            assert await cache.has_flag(deps.key_live()) is True
@@ -0,0 +1,111 @@
+"""Tests for frame pacing of listener events."""
+
+import asyncio
+
+import pytest
+
+from pydantic_ai_stream.pacing import pace
+
+
+def delta(text: str, event_idx: int = 0) -> dict:
+    return {
+        "type": "event",
+        "origin": "pydantic-ai",
+        "body": {
+            "idx": 0,
+            "event": "part_delta",
+            "event_idx": event_idx,
+            "part_delta_kind": "text",
+            "content_delta": text,
+        },
+    }
+
+
+def structural(name: str) -> dict:
+    return {"type": "event", "origin": "pydantic-ai", "body": {"idx": 0, "event": name}}
+
+
+async def source(*items, gap: float = 0):
+    for item in items:
+        if isinstance(item, float):
+            await asyncio.sleep(item)
+            continue
+        yield item
+        if gap:
+            await asyncio.sleep(gap)
+
+
+async def collect(events) -> list:
+    return [e async for e in events]
+
+
+class TestPace:
+    @pytest.mark.asyncio
+    async def test_merges_burst_into_one_frame(self):
+        events = await collect(
+            pace(source(delta("He"), delta("ll"), delta("o")), rate=30)
+        )
+        assert len(events) == 1
+        assert events[0]["body"]["content_delta"] == "Hello"
+
+    @pytest.mark.asyncio
+    async def test_keeps_parts_apart(self):
+        events = await collect(
+            pace(source(delta("a", 0), delta("x", 1), delta("b", 0)), rate=30)
+        )
+        assert [e["body"]["content_delta"] for e in events] == ["ab", "x"]
+
+    @pytest.mark.asyncio
+    async def test_structural_events_flush_immediately(self):
+        items = (delta("a"), delta("b"), structural("llm-end"), delta("c"))
+        events = await collect(pace(source(*items), rate=1))
+        assert [e["body"].get("content_delta", e["body"]["event"]) for e in events] == [
+            "ab",
+            "llm-end",
+            "c",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_flushes_at_frame_rate(self):
+        loop = asyncio.get_running_loop()
+        times = []
+        items = [delta(str(i)) for i in range(20)]
+        async for _ in pace(source(*items, gap=0.005), rate=20):
+            times.append(loop.time())
+        # 20 deltas over ~100ms at 20 frames/s: a handful of frames, not 20
+        assert 2 <= len(times) <= 5
+
+    @pytest.mark.asyncio
+    async def test_does_not_mutate_source_events(self):
+        first = delta("a")
+        await collect(pace(source(first, delta("b")), rate=30))
+        assert first["body"]["content_delta"] == "a"
+
+    @pytest.mark.asyncio
+    async def test_propagates_source_errors(self):
+        async def failing():
+            yield delta("a")
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await collect(pace(failing(), rate=30))
+
+
+class TestListenFrameRate:
+    @pytest.mark.asyncio
+    async def test_listen_with_frame_rate(self, make_deps):
+        deps = make_deps()
+        await deps.start()
+        for text in ("He", "ll", "o"):
+            await deps.add(**delta(text))
+        await deps.add(**structural("llm-end"))
+        await deps.stop()
+        events = [
+            e
+            async for e in deps.listen(
+                serialize=False, wait=1, timeout=1, frame_rate=30
+            )
+        ]
+        bodies = [e["body"] for e in events[1:]]
+        assert bodies[0]["content_delta"] == "Hello"
+        assert bodies[1]["event"] == "llm-end"
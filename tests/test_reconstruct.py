@@ -0,0 +1,113 @@
+import json
+from collections.abc import AsyncIterator
+
+import pytest
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import ModelMessage, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from pydantic_ai_stream import Session, codec, run, settings
+from pydantic_ai_stream.reconstruct import anodes_from_entries, nodes_from_entries
+
+from .conftest import AppDeps, MemorySession
+
+
+def tool_agent(result: object) -> Agent:
+    async def reply(
+        msgs: list[ModelMessage], info: AgentInfo
+    ) -> AsyncIterator[str | dict[int, DeltaToolCall]]:
+        if not isinstance(msgs[-1].parts[-1], ToolReturnPart):
+            yield {0: DeltaToolCall(name="lookup", json_args='{"q": "x"}')}
+            return
+        for delta in ("The ", "answer ", "is ", "here"):
+            yield delta
+
+    agent = Agent(FunctionModel(stream_function=reply), deps_type=AppDeps)
+
+    @agent.tool
+    async def lookup(ctx: RunContext[AppDeps], q: str) -> object:
+        return result
+
+    return agent
+
+
+def comparable(nodes: list[dict]) -> list[list[dict]]:
+    # The stream carries no user prompts and no response metadata
+    out = []
+    for node in nodes:
+        parts = []
+        for part in node["parts"]:
+            if part["part_kind"] == "user-prompt":
+                continue
+            args = part.get("args")
+            part = {
+                k: v
+                for k, v in part.items()
+                if k in ("part_kind", "content", "tool_name", "tool_call_id")
+            }
+            if args is not None:
+                part["args"] = json.loads(args) if isinstance(args, str) else args
+            parts.append(part)
+        out.append(parts)
+    return out
+
+
+async def streamed(
+    redis, result: object, session_id: str = "rebuild"
+) -> tuple[MemorySession, list]:
+    session = MemorySession()
+    deps = AppDeps(redis=redis, user_id=1, session_id=session_id)
+    await run(session, tool_agent(result), "go", deps)
+    return session, await redis.xrange(deps.key())
+
+
+class TestNodesFromEntries:
+    @pytest.mark.asyncio
+    async def test_matches_nodes_from_msgs(self, redis):
+        session, raw = await streamed(redis, "found it")
+        expected = Session.nodes_from_msgs(json.loads(session.msgs_to_json()))
+        nodes = nodes_from_entries(raw)
+        assert comparable(nodes) == comparable(expected)
+        assert nodes[1]["parts"][-1]["content"] == "The answer is here"
+        assert all(part["signature"] is None for n in nodes for part in n["parts"])
+
+    @pytest.mark.asyncio
+    async def test_reassembles_chunked_tool_returns(self, redis):
+        settings.set_tool_return_chunk_size(8)
+        try:
+            _, raw = await streamed(redis, {"rows": list(range(20))})
+        finally:
+            settings.set_tool_return_chunk_size(64 * 1024)
+        tool_return = nodes_from_entries(raw)[1]["parts"][0]
+        assert tool_return["part_kind"] == "tool-return"
+        assert tool_return["content"] == {"rows": list(range(20))}
+        assert "chunks" not in tool_return
+
+    @pytest.mark.asyncio
+    async def test_accepts_decoded_and_msgpack_entries(self, redis):
+        pytest.importorskip("msgpack")
+        _, raw = await streamed(redis, "found it")
+        settings.set_stream_codec("msgpack")
+        try:
+            _, packed = await streamed(redis, "found it", "packed")
+        finally:
+            settings.set_stream_codec("json")
+        decoded = [(entry_id.decode(), codec.decode(f)) for entry_id, f in raw]
+        assert nodes_from_entries(decoded) == nodes_from_entries(raw)
+        # Tool call ids are random per run
+        unpacked, plain = nodes_from_entries(packed), nodes_from_entries(raw)
+        for part in (p for node in unpacked + plain for p in node["parts"]):
+            part.pop("tool_call_id", None)
+        assert comparable(unpacked) == comparable(plain)
+
+    @pytest.mark.asyncio
+    async def test_async_variant(self, redis):
+        _, raw = await streamed(redis, "found it")
+        assert await anodes_from_entries(raw) == nodes_from_entries(raw)
+
+    def test_ignores_non_event_entries(self):
+        entries = [
+            ("1-0", {"type": "begin", "origin": "x", "body": {}}),
+            ("2-0", {"type": "error", "origin": "x", "body": {"msg": "boom"}}),
+        ]
+        assert nodes_from_entries(entries) == []
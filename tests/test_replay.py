@@ -0,0 +1,96 @@
+"""Tests for stream and history replay."""
+
+import pytest
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from pydantic_ai_stream import MemoryTransport
+from pydantic_ai_stream.replay import record_msgs, record_stream, replay, replay_many
+
+from .conftest import AppDeps
+
+MSGS = [
+    ModelRequest(parts=[UserPromptPart(content="weather?")]),
+    ModelResponse(
+        parts=[ToolCallPart(tool_name="w", args={"c": "x"}, tool_call_id="c1")]
+    ),
+    ModelRequest(
+        parts=[ToolReturnPart(tool_name="w", content="sun", tool_call_id="c1")]
+    ),
+    ModelResponse(parts=[TextPart(content="It is sunny")]),
+]
+
+
+def kinds(events):
+    return [(e.type, e.body.get("event")) for e in events]
+
+
+class TestRecord:
+    def test_record_msgs(self):
+        events = record_msgs(MSGS)
+        assert kinds(events) == [
+            ("begin", None),
+            ("event", "llm-begin"),
+            ("event", "part_start"),
+            ("event", "llm-end"),
+            ("event", "llm-begin"),
+            ("event", "part_start"),
+            ("event", "part_start"),
+            ("event", "llm-end"),
+            ("end", None),
+        ]
+        assert events[2].body["args"] == {"c": "x"}
+        assert events[5].body["content"] == "sun"
+        assert all(e.offset >= 0 for e in events)
+
+    def test_record_msgs_splits_deltas(self):
+        events = record_msgs(MSGS, delta_chars=4)
+        deltas = [
+            e.body["content_delta"]
+            for e in events
+            if e.body.get("event") == "part_delta"
+        ]
+        assert deltas == ["s su", "nny"]
+
+    @pytest.mark.asyncio
+    async def test_record_stream_pages(self, redis, make_deps):
+        deps = make_deps()
+        await deps.start()
+        for n in range(5):
+            await deps.add_info({"n": n})
+        await deps.stop()
+        events = await record_stream(redis, deps.key(), page=2)
+        assert [e.type for e in events] == ["begin"] + ["info"] * 5 + ["end"]
+        assert events[0].offset == 0
+
+
+class TestReplay:
+    @pytest.mark.asyncio
+    async def test_replay_reproduces_stream(self, redis, make_deps):
+        deps = make_deps()
+        await replay(deps, record_msgs(MSGS), speed=0)
+        events = [e async for e in deps.listen(serialize=False, wait=1, timeout=1)]
+        assert events[0]["body"] == {"session_id": deps.session_id}
+        assert events[-2]["body"]["content"] == "It is sunny"
+        assert await deps.is_live() is False
+
+    @pytest.mark.asyncio
+    async def test_replay_many_in_memory(self):
+        bus = MemoryTransport()
+        events = record_msgs(MSGS)
+        await replay_many(
+            lambda n: AppDeps(transport=bus, user_id=1, session_id=f"sim-{n}"),
+            events,
+            runs=20,
+            speed=0,
+            concurrency=5,
+        )
+        for n in range(20):
+            deps = AppDeps(transport=bus, user_id=1, session_id=f"sim-{n}")
+            assert len(await bus.range(deps.key())) == len(events)
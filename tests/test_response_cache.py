@@ -0,0 +1,239 @@
+import json
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+import pytest
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.models.test import TestModel
+
+from pydantic_ai_stream import ResponseCache, run
+from pydantic_ai_stream.deps import Node
+from pydantic_ai_stream.response_cache import agent_fingerprint, agent_id
+
+from .conftest import AppDeps, MemorySession
+
+
+def counting_agent(calls: list[int], name: str = "faq") -> Agent:
+    async def reply(msgs: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+        calls.append(1)
+        yield "Hello there"
+
+    return Agent(FunctionModel(stream_function=reply), name=name)
+
+
+@dataclass
+class NamedDeps(AppDeps):
+    name: str = ""
+
+
+def greeting_agent(calls: list[int]) -> Agent:
+    async def reply(msgs: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+        calls.append(1)
+        yield msgs[-1].instructions or ""
+
+    agent = Agent(FunctionModel(stream_function=reply), deps_type=NamedDeps)
+
+    @agent.instructions
+    def greet(ctx: RunContext[NamedDeps]) -> str:
+        return f"hello {ctx.deps.name}"
+
+    return agent
+
+
+def tool_agent(calls: list[int]) -> Agent:
+    async def reply(msgs: list[ModelMessage], info: AgentInfo) -> AsyncIterator:
+        calls.append(1)
+        if len(msgs) == 1:
+            yield {0: DeltaToolCall(name="lookup", json_args='{"city": "Paris"}')}
+        else:
+            yield "Sunny"
+
+    agent = Agent(FunctionModel(stream_function=reply))
+
+    @agent.tool_plain
+    def lookup(city: str) -> str:
+        return f"{city}: sunny"
+
+    return agent
+
+
+async def bodies(redis, deps) -> list[dict]:
+    return [
+        json.loads(f[b"body"]) if f.get(b"body") else {}
+        for _, f in await redis.xrange(deps.key())
+    ]
+
+
+class TestAgentId:
+    def test_includes_agent_name_and_model(self):
+        agent = counting_agent([], name="faq")
+        assert agent_id(agent).startswith("faq/")
+        assert agent_id(agent) != agent_id(counting_agent([], name="other"))
+
+    def test_model_override_wins(self):
+        agent = counting_agent([])
+        assert agent_id(agent, "openai:gpt-4o") == "faq/openai:gpt-4o"
+
+
+class TestAgentFingerprint:
+    def test_unnamed_agents_differ_by_configuration(self):
+        pirate = Agent(TestModel(), system_prompt="You are a pirate")
+        lawyer = Agent(TestModel(), system_prompt="You are a lawyer")
+        typed = Agent(TestModel(), system_prompt="You are a pirate", output_type=int)
+        assert agent_id(pirate) == agent_id(lawyer)
+        fingerprints = {agent_fingerprint(a) for a in (pirate, lawyer, typed)}
+        assert len(fingerprints) == 3
+
+    def test_tools_instructions_and_settings(self):
+        def lookup(city: str) -> str:
+            return city
+
+        base = Agent(TestModel())
+        assert agent_fingerprint(base) == agent_fingerprint(Agent(TestModel()))
+        others = [
+            Agent(TestModel(), tools=[lookup]),
+            Agent(TestModel(), instructions="Be brief"),
+            Agent(TestModel(), model_settings={"temperature": 0}),
+        ]
+        assert agent_fingerprint(base) not in {agent_fingerprint(a) for a in others}
+        assert agent_fingerprint(base) != agent_fingerprint(
+            base, {"model_settings": {"temperature": 0}}
+        )
+
+
+class TestRunResponseCache:
+    @pytest.mark.asyncio
+    async def test_hit_skips_model_and_replays_turn(self, redis, make_deps):
+        calls: list[int] = []
+        agent = counting_agent(calls)
+        cache = ResponseCache(redis=redis, ttl=60)
+
+        first, miss_deps = MemorySession(), make_deps()
+        await run(first, agent, "hi", miss_deps, response_cache=cache)
+        second, hit_deps = MemorySession(), make_deps()
+        await run(second, agent, "hi", hit_deps, response_cache=cache)
+
+        assert len(calls) == 1
+        assert second.msgs == first.msgs
+        hit = await bodies(redis, hit_deps)
+        assert hit[1:-1] == (await bodies(redis, miss_deps))[1:-1]
+        assert [b.get("event") for b in hit[1:-1]] == [
+            "llm-begin",
+            "part_start",
+            "answer",
+            "llm-end",
+        ]
+        assert hit[2]["content"] == "Hello there"
+
+    @pytest.mark.asyncio
+    async def test_hit_replays_tool_events_after_existing_nodes(self, redis, make_deps):
+        calls: list[int] = []
+        agent = tool_agent(calls)
+        cache = ResponseCache(redis=redis, ttl=60)
+
+        miss_deps = make_deps()
+        await run(MemorySession(), agent, "weather?", miss_deps, response_cache=cache)
+        hit_deps = make_deps()
+        hit_deps.runtime.nodes.append(Node(idx=0, stopped=True))
+        await run(MemorySession(), agent, "weather?", hit_deps, response_cache=cache)
+
+        assert len(calls) == 2
+        miss, hit = await bodies(redis, miss_deps), await bodies(redis, hit_deps)
+        kinds = [b.get("event") for b in miss[1:-1]]
+        assert "tool-start" in kinds and "tool-end" in kinds and "answer" in kinds
+        assert [b.get("event") for b in hit[1:-1]] == kinds
+        assert [b["idx"] for b in hit[1:-1]] == [b["idx"] + 1 for b in miss[1:-1]]
+        assert [n.idx for n in hit_deps.runtime.nodes] == [0, 1, 2]
+        assert all(n.stopped for n in hit_deps.runtime.nodes)
+
+    @pytest.mark.asyncio
+    async def test_key_depends_on_history_and_prompt(self, redis, make_deps):
+        calls: list[int] = []
+        agent = counting_agent(calls)
+        cache = ResponseCache(redis=redis, ttl=60)
+
+        session = MemorySession()
+        await run(session, agent, "hi", make_deps(), response_cache=cache)
+        await run(session, agent, "hi", make_deps(), response_cache=cache)
+        await run(MemorySession(), agent, "bye", make_deps(), response_cache=cache)
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_unnamed_agents_miss_each_other(self, redis, make_deps):
+        cache = ResponseCache(redis=redis, ttl=60)
+        pirate = Agent(TestModel(), system_prompt="You are a pirate")
+        lawyer = Agent(TestModel(), system_prompt="You are a lawyer", output_type=int)
+        await run(MemorySession(), pirate, "hi", make_deps(), response_cache=cache)
+        session = MemorySession()
+        await run(session, lawyer, "hi", make_deps(), response_cache=cache)
+        assert len(await redis.keys(cache.key("*"))) == 2
+        parts = [part for msg in session.msgs for part in msg.parts]
+        assert any(getattr(part, "tool_name", None) == "final_result" for part in parts)
+
+    @pytest.mark.asyncio
+    async def test_shared_keys_by_rendered_instructions(self, redis):
+        calls: list[int] = []
+        agent = greeting_agent(calls)
+        cache = ResponseCache(redis=redis, ttl=60, shared=True)
+
+        def deps(name: str, user_id: int) -> NamedDeps:
+            return NamedDeps(
+                redis=redis, user_id=user_id, session_id=f"s-{name}", name=name
+            )
+
+        alice, bob, carol = MemorySession(), MemorySession(), MemorySession()
+        await run(alice, agent, "hi", deps("alice", 1), response_cache=cache)
+        await run(bob, agent, "hi", deps("bob", 2), response_cache=cache)
+        await run(
+            carol,
+            agent,
+            "hi",
+            NamedDeps(redis=redis, user_id=3, session_id="s-carol", name="alice"),
+            response_cache=cache,
+        )
+
+        assert len(calls) == 2
+        assert alice.msgs[-1].parts[0].content == "hello alice"
+        assert bob.msgs[-1].parts[0].content == "hello bob"
+        assert carol.msgs == alice.msgs
+
+    @pytest.mark.asyncio
+    async def test_entries_are_private_to_the_user_by_default(self, redis, make_deps):
+        calls: list[int] = []
+        agent = counting_agent(calls)
+        cache = ResponseCache(redis=redis, ttl=60)
+        for user_id in (1, 2, 1):
+            await run(
+                MemorySession(), agent, "hi", make_deps(user_id), response_cache=cache
+            )
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_namespace_separates_entries(self, redis, make_deps):
+        calls: list[int] = []
+        agent = counting_agent(calls)
+        for namespace in ("tenant-a", "tenant-b"):
+            cache = ResponseCache(redis=redis, ttl=60, namespace=namespace)
+            await run(MemorySession(), agent, "hi", make_deps(), response_cache=cache)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_entries_expire(self, redis, make_deps):
+        cache = ResponseCache(redis=redis, ttl=60)
+        await run(
+            MemorySession(), counting_agent([]), "hi", make_deps(), response_cache=cache
+        )
+        keys = await redis.keys(cache.key("*"))
+        assert len(keys) == 1
+        assert 0 < await redis.ttl(keys[0]) <= 60
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self, redis, make_deps):
+        calls: list[int] = []
+        agent = counting_agent(calls)
+        await run(MemorySession(), agent, "hi", make_deps())
+        await run(MemorySession(), agent, "hi", make_deps())
+        assert len(calls) == 2
+        assert await redis.keys(ResponseCache(redis=redis).key("*")) == []
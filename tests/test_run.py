@@ -1,12 +1,16 @@
 """Tests for run() function and AgxCanceledError."""
 
+import asyncio
 import json
 from dataclasses import dataclass
 from unittest.mock import MagicMock
 
 import pytest
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.models.test import TestModel
 
-from pydantic_ai_stream import AgxCanceledError, Deps, Session, run
+from pydantic_ai_stream import AgxCanceledError, Deps, Session, run, settings
 
 
 @dataclass
@@ -108,6 +112,62 @@ class TestRunLifecycle:
         assert await deps.is_live() is False
 
 
+class TestRunStartup:
+    @pytest.mark.asyncio
+    async def test_load_and_start_overlap(self, redis):
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-overlap")
+        live_during_load = []
+
+        @dataclass
+        class SlowSession(MockSession):
+            async def load(self) -> None:
+                await asyncio.sleep(0.01)
+                live_during_load.append(await deps.is_live())
+
+        await run(SlowSession(), MockAgent(), "hello", deps)
+        assert live_during_load == [True]
+
+    @pytest.mark.asyncio
+    async def test_prewarm_is_awaited(self, redis):
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-prewarm")
+        warmed = []
+
+        async def prewarm():
+            warmed.append(True)
+
+        await run(MockSession(), MockAgent(), "hello", deps, prewarm=prewarm)
+        assert warmed == [True]
+
+    @pytest.mark.asyncio
+    async def test_prewarm_failure_does_not_fail_turn(self, redis, caplog):
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-prewarm-fail")
+
+        async def prewarm():
+            raise ConnectionError("cache unreachable")
+
+        await run(MockSession(), MockAgent(), "hello", deps, prewarm=prewarm)
+        types = [f[b"type"] for _, f in await redis.xrange(deps.key())]
+        assert types == [b"begin", b"end"]
+        assert "cache unreachable" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_load_failure_closes_stream(self, redis):
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-load-fail")
+
+        @dataclass
+        class BrokenSession(MockSession):
+            async def load(self) -> None:
+                raise OSError("storage down")
+
+        with pytest.raises(OSError, match="storage down"):
+            await run(BrokenSession(), MockAgent(), "hello", deps)
+        entries = await redis.xrange(deps.key())
+        types = [f[b"type"] for _, f in entries]
+        assert b"error" in types
+        assert types[-1] == b"end"
+        assert await deps.is_live() is False
+
+
 class TestRunCancellation:
     @pytest.mark.asyncio
     async def test_raises_canceled_error_when_not_live(self, redis):
@@ -292,6 +352,117 @@ class TestRunErrorHandling:
         assert b"end" in types
 
 
+class TestRunTools:
+    @pytest.mark.asyncio
+    async def test_streams_tool_lifecycle(self, redis):
+        agent = Agent(TestModel(), deps_type=MockDeps)
+
+        @agent.tool
+        async def lookup(ctx: RunContext[MockDeps], q: str) -> str:
+            await ctx.deps.add_tool_progress(ctx.tool_call_id, {"step": 1})
+            return "found"
+
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-tools")
+        await run(MockSession(), agent, "hello", deps)
+        entries = await redis.xrange(deps.key())
+        events = [
+            json.loads(f[b"body"]).get("event")
+            for _, f in entries
+            if f[b"type"] == b"event"
+        ]
+        start = events.index("tool-start")
+        assert events[start + 1 : start + 3] == ["tool-progress", "tool-end"]
+        assert deps.runtime.tool_stats["lookup"].calls == 1
+
+
+@pytest.fixture
+def fast_cancel():
+    settings.set_cancel_poll_interval(0.01)
+    yield
+    settings.set_cancel_poll_interval(0.5)
+
+
+class TestRunCooperativeCancel:
+    @pytest.mark.asyncio
+    async def test_interrupts_model_stream(self, redis, fast_cancel):
+        sent: list[int] = []
+
+        async def reply(msgs, info: AgentInfo):
+            for n in range(1000):
+                sent.append(n)
+                yield f"{n} "
+                await asyncio.sleep(0.005)
+
+        agent = Agent(FunctionModel(stream_function=reply), deps_type=MockDeps)
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-coop-stream")
+        task = asyncio.create_task(run(MockSession(), agent, "hello", deps))
+        while len(sent) < 5:
+            await asyncio.sleep(0.005)
+        await deps.cancel()
+        with pytest.raises(AgxCanceledError):
+            await asyncio.wait_for(task, 2)
+        assert len(sent) < 1000
+        bodies = [
+            (f[b"type"], json.loads(f[b"body"]) if f.get(b"body") else {})
+            for _, f in await redis.xrange(deps.key())
+        ]
+        assert (b"event", {"idx": 0, "event": "canceled"}) in bodies
+        assert (b"error", {"msg": "canceled"}) in bodies
+        assert bodies[-1][0] == b"end"
+        assert deps.runtime.nodes[0].stopped
+
+    @pytest.mark.asyncio
+    async def test_interrupts_running_tool(self, redis, fast_cancel):
+        tool = {"started": asyncio.Event(), "canceled": False}
+
+        async def reply(msgs, info: AgentInfo):
+            yield {0: DeltaToolCall(name="slow", json_args="{}")}
+
+        agent = Agent(FunctionModel(stream_function=reply), deps_type=MockDeps)
+
+        @agent.tool
+        async def slow(ctx: RunContext[MockDeps]) -> str:
+            tool["started"].set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                tool["canceled"] = True
+                raise
+            return "done"
+
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-coop-tool")
+        task = asyncio.create_task(run(MockSession(), agent, "hello", deps))
+        await tool["started"].wait()
+        await deps.cancel()
+        with pytest.raises(AgxCanceledError):
+            await asyncio.wait_for(task, 2)
+        assert tool["canceled"] is True
+        assert deps.runtime.tool_calls == {}
+
+    @pytest.mark.asyncio
+    async def test_outer_cancellation_propagates(self, redis, fast_cancel):
+        stream = {"closed": False}
+
+        async def reply(msgs, info: AgentInfo):
+            try:
+                await asyncio.sleep(60)
+            finally:
+                stream["closed"] = True
+            yield "never"
+
+        agent = Agent(FunctionModel(stream_function=reply), deps_type=MockDeps)
+        deps = MockDeps(redis=redis, user_id=1, session_id="test-coop-outer")
+        task = asyncio.create_task(run(MockSession(), agent, "hello", deps))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The turn and the watcher are finished, not just asked to stop
+        assert stream["closed"] is True
+        assert not [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        assert await deps.is_live() is False
+
+
 class TestAgxCanceledError:
     def test_is_exception(self):
         assert issubclass(AgxCanceledError, Exception)
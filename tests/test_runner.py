@@ -0,0 +1,161 @@
+"""Tests for Runner admission control."""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from unittest.mock import MagicMock
+
+import pytest
+
+from pydantic_ai_stream import AgxCanceledError, Deps, Runner
+
+from .conftest import MemorySession
+
+
+@dataclass
+class MockDeps(Deps):
+    def get_scope_id(self) -> int:
+        return 1
+
+
+class GatedAgent:
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.started: list[str] = []
+
+    def iter(self, user_prompt, *, deps, **kwargs):
+        return GatedContext(self, user_prompt, deps)
+
+
+class GatedContext:
+    def __init__(self, agent: GatedAgent, user_prompt: str, deps):
+        self.agent = agent
+        self.user_prompt = user_prompt
+        self.deps = deps
+
+    async def __aenter__(self):
+        self.agent.started.append(self.user_prompt)
+        await self.agent.gate.wait()
+        run = MagicMock()
+        run.result.new_messages.return_value = []
+        run.__aiter__.return_value = iter([])
+        return run
+
+    async def __aexit__(self, *args):
+        pass
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+async def infos(redis, deps):
+    entries = await redis.xrange(deps.key())
+    return [json.loads(f[b"body"]) for _, f in entries if f[b"type"] == b"info"]
+
+
+class TestAdmission:
+    @pytest.mark.asyncio
+    async def test_runs_immediately_under_limits(self, redis):
+        runner = Runner(max_runs=2)
+        agent = GatedAgent()
+        deps = MockDeps(redis=redis, user_id=1, session_id="r-1")
+        future = await runner.submit(MemorySession(), agent, "a", deps)
+        await settle()
+        assert agent.started == ["a"]
+        agent.gate.set()
+        await future
+        assert runner.running == 0
+
+    @pytest.mark.asyncio
+    async def test_global_limit_queues_overflow(self, redis):
+        runner = Runner(max_runs=1, max_runs_per_user=None)
+        agent = GatedAgent()
+        d1 = MockDeps(redis=redis, user_id=1, session_id="g-1")
+        d2 = MockDeps(redis=redis, user_id=2, session_id="g-2")
+        await runner.submit(MemorySession(), agent, "a", d1)
+        await runner.submit(MemorySession(), agent, "b", d2)
+        await settle()
+        assert agent.started == ["a"]
+        assert len(runner.queue) == 1
+        assert await infos(redis, d2) == [{"msg": "queued", "queue_position": 1}]
+        agent.gate.set()
+        await runner.join()
+        assert agent.started == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_per_user_limit_lets_other_users_through(self, redis):
+        runner = Runner(max_runs=4, max_runs_per_user=1)
+        agent = GatedAgent()
+        d1 = MockDeps(redis=redis, user_id=1, session_id="u-1")
+        d2 = MockDeps(redis=redis, user_id=1, session_id="u-2")
+        d3 = MockDeps(redis=redis, user_id=2, session_id="u-3")
+        for prompt, deps in (("a", d1), ("b", d2), ("c", d3)):
+            await runner.submit(MemorySession(), agent, prompt, deps)
+        await settle()
+        assert agent.started == ["a", "c"]
+        agent.gate.set()
+        await runner.join()
+        assert sorted(agent.started) == ["a", "b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_queue_positions_are_republished(self, redis):
+        runner = Runner(max_runs=1, max_runs_per_user=None)
+        agent = GatedAgent()
+        deps = [MockDeps(redis=redis, user_id=i, session_id=f"p-{i}") for i in range(3)]
+        for i, d in enumerate(deps):
+            await runner.submit(MemorySession(), agent, str(i), d)
+        agent.gate.set()
+        await runner.join()
+        positions = [b["queue_position"] for b in await infos(redis, deps[2])]
+        assert positions == [2, 1]
+
+
+class TestQueuedCancellation:
+    @pytest.mark.asyncio
+    async def test_queued_run_is_live_and_cancelable(self, redis):
+        runner = Runner(max_runs=1, max_runs_per_user=None)
+        agent = GatedAgent()
+        d1 = MockDeps(redis=redis, user_id=1, session_id="c-1")
+        d2 = MockDeps(redis=redis, user_id=2, session_id="c-2")
+        await runner.submit(MemorySession(), agent, "a", d1)
+        future = await runner.submit(MemorySession(), agent, "b", d2)
+        assert await d2.is_live() is True
+        assert await d2.cancel() is True
+        agent.gate.set()
+        with pytest.raises(AgxCanceledError):
+            await future
+        assert agent.started == ["a"]
+        types = [f[b"type"] for _, f in await redis.xrange(d2.key())]
+        assert types == [b"begin", b"info", b"error", b"end"]
+
+    @pytest.mark.asyncio
+    async def test_queued_stream_opens_once(self, redis):
+        runner = Runner(max_runs=1, max_runs_per_user=None, queued_ttl=30)
+        agent = GatedAgent()
+        d1 = MockDeps(redis=redis, user_id=1, session_id="o-1")
+        d2 = MockDeps(redis=redis, user_id=2, session_id="o-2")
+        await runner.submit(MemorySession(), agent, "a", d1)
+        await runner.submit(MemorySession(), agent, "b", d2)
+        assert 0 < await redis.ttl(d2.key_live()) <= 30
+        agent.gate.set()
+        await runner.join()
+        assert agent.started == ["a", "b"]
+        types = [f[b"type"] for _, f in await redis.xrange(d2.key())]
+        assert types == [b"begin", b"info", b"end"]
+        assert runner.flagged == set() and runner.keepalive.done()
+
+    @pytest.mark.asyncio
+    async def test_queued_flag_ttl_is_refreshed(self, redis):
+        runner = Runner(max_runs=1, max_runs_per_user=None, queued_ttl=3)
+        agent = GatedAgent()
+        d1 = MockDeps(redis=redis, user_id=1, session_id="k-1")
+        d2 = MockDeps(redis=redis, user_id=2, session_id="k-2")
+        await runner.submit(MemorySession(), agent, "a", d1)
+        await runner.submit(MemorySession(), agent, "b", d2)
+        await redis.expire(d2.key_live(), 100)
+        await asyncio.sleep(1.1)
+        assert 0 < await redis.ttl(d2.key_live()) <= 3
+        agent.gate.set()
+        await runner.join()
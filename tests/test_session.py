@@ -6,11 +6,24 @@ import pytest
 from pydantic_ai.messages import (
     ModelRequest,
     ModelResponse,
+    SystemPromptPart,
     TextPart,
+    ToolCallPart,
+    ToolReturnPart,
     UserPromptPart,
 )
+from pydantic_ai.usage import RequestUsage
 
-from pydantic_ai_stream import Session
+from pydantic_ai_stream import Session, history, offload, settings
+from pydantic_ai_stream.offload import shutdown
+
+
+@pytest.fixture(params=["inline", "thread", "process"])
+def offload_mode(request):
+    settings.set_offload(request.param, workers=1, min_bytes=0, min_msgs=0)
+    yield request.param
+    settings.set_offload("inline", min_bytes=256 * 1024, min_msgs=200)
+    shutdown()
 
 
 @dataclass
@@ -55,6 +68,141 @@ class TestMessageSerialization:
         assert len(session.msgs) == 2
 
 
+class TestAsyncSerialization:
+    @pytest.mark.asyncio
+    async def test_roundtrip(self, offload_mode):
+        session = MemorySession()
+        session.add_msgs(
+            [
+                ModelRequest(parts=[UserPromptPart(content="Hello")]),
+                ModelResponse(parts=[TextPart(content="Hi there!")]),
+            ]
+        )
+        data = await session.amsgs_to_json()
+        assert data == session.msgs_to_json()
+        session2 = MemorySession()
+        await session2.amsgs_from_json(data)
+        assert session2.msgs == session.msgs
+
+    @pytest.mark.asyncio
+    async def test_nodes_from_msgs(self, offload_mode):
+        msgs = [
+            {"kind": "request", "parts": [{"part_kind": "user-prompt"}]},
+            {"kind": "response", "parts": [{"part_kind": "text"}]},
+        ]
+        nodes = await MemorySession.anodes_from_msgs(msgs)
+        assert nodes == Session.nodes_from_msgs(msgs)
+
+    @pytest.mark.asyncio
+    async def test_small_payloads_stay_inline(self, monkeypatch):
+        settings.set_offload("thread", workers=1)
+        try:
+
+            def fail():
+                raise AssertionError("executor used")
+
+            monkeypatch.setattr(offload, "get_executor", fail)
+            session = MemorySession()
+            await session.amsgs_from_json(await session.amsgs_to_json())
+        finally:
+            settings.set_offload("inline")
+            shutdown()
+
+
+def turn(prompt: str, answer: str, output_tokens: int = 0):
+    return [
+        ModelRequest(parts=[UserPromptPart(content=prompt)]),
+        ModelResponse(
+            parts=[TextPart(content=answer)],
+            usage=RequestUsage(input_tokens=10, output_tokens=output_tokens),
+        ),
+    ]
+
+
+class TestHistoryIndex:
+    def test_tracks_sizes_incrementally(self):
+        session = MemorySession()
+        session.add_msgs(turn("a", "b"))
+        assert len(session.index) == 2
+        session.add_msgs(turn("c", "d"))
+        index = session.index
+        assert len(index) == 4
+        assert index.cum_bytes[-1] == sum(index.nbytes) == index.total_bytes
+        assert index.cum_tokens == [
+            sum(index.ntokens[: i + 1]) for i in range(len(index))
+        ]
+
+    def test_usage_summary(self):
+        session = MemorySession()
+        session.add_msgs(turn("a", "b", output_tokens=5) + turn("c", "d", 7))
+        usage = session.usage()
+        assert usage.requests == 2
+        assert usage.input_tokens == 20
+        assert usage.output_tokens == 12
+
+    def test_catches_up_with_direct_appends(self):
+        session = MemorySession()
+        session.msgs.extend(turn("a", "b"))
+        assert len(session.indexed()) == 2
+
+    def test_msgs_from_json_resets_index(self):
+        session = MemorySession()
+        session.add_msgs(turn("a", "b") + turn("c", "d"))
+        data = MemorySession(msgs=turn("x", "y")).msgs_to_json()
+        session.msgs_from_json(data)
+        assert len(session.indexed()) == 2
+
+    def test_load_indexes_without_reserializing(self, monkeypatch):
+        msgs = turn("a", "b", output_tokens=5) + turn("héllo", "wörld")
+        data = MemorySession(msgs=msgs).msgs_to_json()
+        expected = MemorySession(msgs=msgs).indexed()
+
+        def dump_json(*args, **kwargs):
+            raise AssertionError("history re-serialized a loaded message")
+
+        monkeypatch.setattr(history.ModelMessagesTypeAdapter, "dump_json", dump_json)
+        session = MemorySession()
+        session.msgs_from_json(data)
+        session.history(expected.ntokens[-1])
+        assert session.index.nbytes == expected.nbytes
+        assert session.index.cum_tokens == expected.cum_tokens
+        assert session.usage().output_tokens == expected.usage.output_tokens
+
+    def test_json_sizes_skips_whitespace(self):
+        assert history.json_sizes(' [ {"a": 1} ,\n"xé", [] ] '.encode()) == [8, 5, 2]
+
+    def test_history_without_budget_is_full(self):
+        session = MemorySession()
+        session.add_msgs(turn("a", "b"))
+        assert session.history() is session.msgs
+        assert session.history(10_000) is session.msgs
+
+    def test_history_trims_to_budget_at_turn_boundary(self):
+        session = MemorySession()
+        session.add_msgs(
+            [
+                ModelRequest(
+                    parts=[
+                        SystemPromptPart(content="be nice"),
+                        UserPromptPart(content="x" * 400),
+                    ]
+                ),
+                ModelResponse(
+                    parts=[ToolCallPart(tool_name="t", args={}, tool_call_id="c")]
+                ),
+                ModelRequest(
+                    parts=[ToolReturnPart(tool_name="t", content="r", tool_call_id="c")]
+                ),
+                ModelResponse(parts=[TextPart(content="y" * 400)]),
+            ]
+            + turn("last", "answer")
+        )
+        budget = sum(session.index.ntokens[-3:])
+        history = session.history(budget)
+        assert [p.content for p in history[0].parts] == ["be nice"]
+        assert history[1:] == session.msgs[-2:]
+
+
 class TestGetUserPrompt:
     def test_empty_msgs_returns_no_title(self):
         session = MemorySession()
@@ -0,0 +1,134 @@
+"""Tests for the in-process MemoryTransport backend."""
+
+import asyncio
+
+import pytest
+
+from pydantic_ai_stream import MemoryTransport, RedisTransport, q
+
+from .conftest import AppDeps
+
+
+@pytest.fixture
+def memory():
+    return MemoryTransport()
+
+
+def make(memory: MemoryTransport, session_id: str = "m-1", user_id: int = 1):
+    return AppDeps(transport=memory, user_id=user_id, session_id=session_id)
+
+
+class TestDepsConstruction:
+    def test_requires_redis_or_transport(self):
+        with pytest.raises(ValueError, match="transport"):
+            AppDeps(user_id=1, session_id="x")
+
+    def test_no_redis_needed_with_transport(self, memory):
+        assert make(memory).redis is None
+
+    def test_redis_client_is_wrapped(self, redis):
+        deps = AppDeps(redis=redis, user_id=1, session_id="x")
+        assert isinstance(deps.transport, RedisTransport)
+        assert deps.transport.redis is redis
+
+
+class TestMemoryLifecycle:
+    @pytest.mark.asyncio
+    async def test_live_flag(self, memory):
+        deps = make(memory)
+        assert await deps.is_live() is False
+        await deps.start()
+        assert await deps.is_live() is True
+        assert await deps.cancel() is True
+        assert await deps.cancel() is False
+
+    @pytest.mark.asyncio
+    async def test_listen_until_end(self, memory):
+        deps = make(memory)
+        await deps.start()
+        await deps.add_info({"n": 1})
+        await deps.stop()
+        events = [e async for e in deps.listen(serialize=False, wait=1, timeout=1)]
+        assert [e["type"] for e in events] == ["begin", "info"]
+        assert events[1]["body"] == {"n": 1}
+
+    @pytest.mark.asyncio
+    async def test_listener_wakes_on_add(self, memory):
+        deps = make(memory)
+        await deps.start()
+
+        async def produce():
+            await asyncio.sleep(0.01)
+            await deps.add_info({"n": 1})
+            await deps.stop()
+
+        task = asyncio.create_task(produce())
+        events = [e async for e in deps.listen(serialize=False, wait=1, timeout=1)]
+        await task
+        assert [e["type"] for e in events] == ["begin", "info"]
+
+    @pytest.mark.asyncio
+    async def test_stop_expires_stream(self, memory):
+        deps = make(memory)
+        await deps.start()
+        await deps.stop(grace_period=0)
+        await asyncio.sleep(0.01)
+        assert await memory.range(deps.key()) == []
+
+    @pytest.mark.asyncio
+    async def test_q_scans_live_flags(self, memory):
+        await make(memory, "a", user_id=7).start()
+        await make(memory, "b", user_id=8).start()
+        sessions = [s async for s in q(memory, 42, 7)]
+        assert sessions == [(42, 7, "a")]
+
+
+class TestMemoryTransport:
+    @pytest.mark.asyncio
+    async def test_ids_increase(self, memory):
+        ids = [
+            await memory.add("k", type="info", origin="t", body=None) for _ in range(3)
+        ]
+        assert ids == sorted(ids, key=lambda i: tuple(map(int, i.split("-"))))
+        assert len(set(ids)) == 3
+
+    @pytest.mark.asyncio
+    async def test_read_returns_after_last_id(self, memory):
+        first = await memory.add("k", type="info", origin="t", body={"n": 1})
+        await memory.add("k", type="info", origin="t", body={"n": 2})
+        res = await memory.read({"k": first}, block=0)
+        assert [e[1]["body"] for e in res[0][1]] == [{"n": 2}]
+
+    @pytest.mark.asyncio
+    async def test_read_times_out(self, memory):
+        assert await memory.read({"k": "0"}, block=10) == []
+
+    @pytest.mark.asyncio
+    async def test_ring_buffer(self):
+        memory = MemoryTransport(max_entries=2)
+        for n in range(3):
+            await memory.add("k", type="info", origin="t", body={"n": n})
+        assert [e[1]["body"]["n"] for e in await memory.range("k")] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_add_only_wakes_readers_of_its_key(self, memory):
+        other = asyncio.create_task(memory.read({"other": "0"}, block=1000))
+        mine = asyncio.create_task(memory.read({"a": "0", "k": "0"}, block=1000))
+        await asyncio.sleep(0)
+        woken = list(memory.waiters["k"])
+        assert len(woken) == 1 and woken[0] not in memory.waiters["other"]
+        await memory.add("k", type="info", origin="t", body={"n": 1})
+        assert [e[1]["body"] for e in (await mine)[0][1]] == [{"n": 1}]
+        assert not other.done()
+        assert set(memory.waiters) == {"other"}
+        other.cancel()
+        await asyncio.gather(other, return_exceptions=True)
+        assert memory.waiters == {}
+
+    @pytest.mark.asyncio
+    async def test_readers_get_their_own_bodies(self, memory):
+        await memory.add("k", type="info", origin="t", body={"part": {"n": 1}})
+        res = await memory.read({"k": "0"}, block=0)
+        event = res[0][1][0][1]
+        event["body"]["part"]["n"] = 2
+        assert (await memory.range("k"))[0][1]["body"] == {"part": {"n": 1}}
@@ -0,0 +1,178 @@
+"""Tests for the Redis work-queue worker."""
+
+import asyncio
+from dataclasses import dataclass
+from unittest.mock import MagicMock
+
+import pytest
+from redis.exceptions import RedisError
+
+from pydantic_ai_stream import Deps, Job, Runner, Worker, enqueue
+from pydantic_ai_stream.worker import key_jobs
+
+from .conftest import MemorySession
+
+
+@dataclass
+class MockDeps(Deps):
+    scope_id: int = 1
+
+    def get_scope_id(self) -> int:
+        return self.scope_id
+
+
+class MockAgent:
+    def __init__(self):
+        self.prompts: list[str] = []
+
+    def iter(self, user_prompt, *, deps, **kwargs):
+        self.prompts.append(user_prompt)
+        return MockContext()
+
+
+class MockContext:
+    async def __aenter__(self):
+        run = MagicMock()
+        run.result.new_messages.return_value = []
+        run.__aiter__.return_value = iter([])
+        return run
+
+    async def __aexit__(self, *args):
+        pass
+
+
+def make_worker(redis, agent, **kwargs) -> Worker:
+    return Worker(
+        redis=redis,
+        agent=agent,
+        make_session=lambda job: MemorySession(),
+        make_deps=lambda job: MockDeps(
+            redis=redis, user_id=job.user_id, session_id=job.session_id, **job.deps
+        ),
+        worker_id="w-1",
+        block=0.1,
+        **kwargs,
+    )
+
+
+class TestJob:
+    def test_roundtrip(self):
+        job = Job(session_id="s", user_id=3, user_prompt="hi", deps={"scope_id": 7})
+        assert Job.loads(job.dumps()) == job
+
+
+class TestWorker:
+    @pytest.mark.asyncio
+    async def test_executes_enqueued_jobs(self, redis):
+        agent = MockAgent()
+        await enqueue(redis, Job(session_id="w-a", user_id=1, user_prompt="one"))
+        await enqueue(redis, Job(session_id="w-b", user_id=2, user_prompt="two"))
+        worker = make_worker(redis, agent)
+        await worker.serve(max_jobs=2)
+        assert agent.prompts == ["one", "two"]
+        deps = MockDeps(redis=redis, user_id=1, session_id="w-a")
+        types = [f[b"type"] for _, f in await redis.xrange(deps.key())]
+        assert types == [b"begin", b"end"]
+        assert await redis.llen(key_jobs()) == 0
+        assert await redis.llen(worker.key_processing()) == 0
+
+    @pytest.mark.asyncio
+    async def test_passes_deps_spec_to_factory(self, redis):
+        await enqueue(
+            redis,
+            Job(session_id="w-s", user_id=1, user_prompt="x", deps={"scope_id": 9}),
+        )
+        await make_worker(redis, MockAgent()).serve(max_jobs=1)
+        deps = MockDeps(redis=redis, user_id=1, session_id="w-s", scope_id=9)
+        assert await redis.exists(deps.key())
+
+    @pytest.mark.asyncio
+    async def test_recovers_unfinished_jobs(self, redis):
+        agent = MockAgent()
+        worker = make_worker(redis, agent)
+        job = Job(session_id="w-r", user_id=1, user_prompt="again")
+        await redis.lpush(worker.key_processing(), job.dumps())
+        await worker.serve(max_jobs=1)
+        assert agent.prompts == ["again"]
+
+    @pytest.mark.asyncio
+    async def test_reaps_jobs_of_dead_workers_with_default_ids(self, redis):
+        # A restarted worker comes back under a new pid, so its default id changes
+        agent = MockAgent()
+        worker = Worker(
+            redis=redis,
+            agent=agent,
+            make_session=lambda job: MemorySession(),
+            make_deps=lambda job: MockDeps(
+                redis=redis, user_id=job.user_id, session_id=job.session_id
+            ),
+            block=0.1,
+        )
+        dead = f"{worker.worker_id.rpartition(':')[0]}:1"
+        job = Job(session_id="w-d", user_id=1, user_prompt="orphan")
+        await redis.lpush(worker.key_processing(dead), job.dumps())
+        await worker.serve(max_jobs=1)
+        assert agent.prompts == ["orphan"]
+        assert await redis.llen(worker.key_processing(dead)) == 0
+
+    @pytest.mark.asyncio
+    async def test_leaves_jobs_of_live_workers(self, redis):
+        worker = make_worker(redis, MockAgent())
+        job = Job(session_id="w-l", user_id=1, user_prompt="busy")
+        await redis.lpush(worker.key_processing("w-2"), job.dumps())
+        await redis.set(worker.key_heartbeat("w-2"), b"1", ex=30)
+        assert await worker.recover() == 0
+        assert await redis.llen(worker.key_processing("w-2")) == 1
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_lives_while_serving(self, redis):
+        await enqueue(redis, Job(session_id="w-h", user_id=1, user_prompt="x"))
+        worker = make_worker(redis, MockAgent())
+        ttls = []
+        make_session = worker.make_session
+
+        def spy(job):
+            ttls.append(asyncio.ensure_future(redis.ttl(worker.key_heartbeat())))
+            return make_session(job)
+
+        worker.make_session = spy
+        await worker.serve(max_jobs=1)
+        assert 0 < ttls[0].result() <= worker.heartbeat_ttl
+        assert not await redis.exists(worker.key_heartbeat())
+
+    @pytest.mark.asyncio
+    async def test_drops_invalid_jobs(self, redis):
+        await redis.lpush(key_jobs(), b"not json")
+        worker = make_worker(redis, MockAgent())
+        await worker.serve(max_jobs=1)
+        assert await redis.llen(worker.key_processing()) == 0
+
+    @pytest.mark.asyncio
+    async def test_keeps_jobs_that_failed_to_submit(self, redis):
+        worker = make_worker(redis, MockAgent())
+        raw = Job(session_id="w-f", user_id=1, user_prompt="x").dumps()
+        await redis.lpush(worker.key_processing(), raw)
+
+        async def unavailable(*args, **kwargs):
+            raise RedisError("connection reset")
+
+        worker.runner.submit = unavailable
+        await worker.handle(raw)
+        assert await redis.lrange(worker.key_processing(), 0, -1) == [raw]
+
+    @pytest.mark.asyncio
+    async def test_reaping_leaves_own_running_jobs(self, redis):
+        worker = make_worker(redis, MockAgent())
+        job = Job(session_id="w-o", user_id=1, user_prompt="running")
+        await redis.lpush(worker.key_processing(), job.dumps())
+        assert await worker._reap() == 0
+        assert await redis.llen(worker.key_processing()) == 1
+
+    @pytest.mark.asyncio
+    async def test_does_not_pull_beyond_capacity(self, redis):
+        for i in range(3):
+            await enqueue(redis, Job(session_id=f"w-c{i}", user_id=i, user_prompt="x"))
+        agent = MockAgent()
+        worker = make_worker(redis, agent, runner=Runner(max_runs=1))
+        await worker.serve(max_jobs=3)
+        assert len(agent.prompts) == 3